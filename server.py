@@ -8,59 +8,54 @@ to work with API requests and returns responses in the format expected by OpenAI
 
 import os
 import sys
-from typing import List, Optional
+import time
+from typing import AsyncIterator, List, Optional
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from langgraph.graph.state import CompiledStateGraph
 
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from src.cache.semantic_cache import SemanticCache
 from src.graph.control_flow import ControlFlowState
 from src.llm.llm_model import LlmModel
 from src.search.tavily import TavilySearch
 from src.vectorstore.document_processor import DocumentProcessor
 
-# Define Pydantic models for API request and response
-class Message(BaseModel):
-	role: str
-	content: str
-
-class ChatCompletionRequest(BaseModel):
-	model: str
-	messages: List[Message]
-	temperature: Optional[float] = 0
-	max_tokens: Optional[int] = None
-	stream: Optional[bool] = False
-	max_retries: Optional[int] = 3
-	web_search_enabled: Optional[bool] = True
-
-class ChatCompletionChoice(BaseModel):
-	index: int
-	message: Message
-	finish_reason: str = "stop"
-
-class ChatCompletionUsage(BaseModel):
-	prompt_tokens: int
-	completion_tokens: int
-	total_tokens: int
-
-class ChatCompletionResponse(BaseModel):
-	id: str
-	object: str = "chat.completion"
-	created: int
-	model: str
-	choices: List[ChatCompletionChoice]
-	usage: ChatCompletionUsage
+# Ollama serves one request at a time by default, which would serialize the concurrent
+# graph and grader calls. These settings are read by an Ollama server started from this
+# environment, and OLLAMA_NUM_PARALLEL also bounds the concurrent document grader calls.
+os.environ.setdefault("OLLAMA_NUM_PARALLEL", "8")
+os.environ.setdefault("OLLAMA_MAX_LOADED_MODELS", "2")
+# Keep the model loaded between idle periods
+os.environ.setdefault("OLLAMA_KEEP_ALIVE", "-1")
+
+# The semantic answer cache is opt-in: questions embedded close together can still ask opposite
+# things (e.g. how to exploit or how to prevent a vulnerability), so the threshold must be tuned
+# to the embedding model before serving answers of other questions
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
 
 # Initialize shared components
 documents_urls = open("rag_urls.txt").read().splitlines()
 print("Loading documents for the vector store,", len(documents_urls), "documents to load...")
-document_processor = DocumentProcessor(urls=documents_urls, model="intfloat/multilingual-e5-large-instruct")
+document_processor = DocumentProcessor(urls=documents_urls, model="intfloat/multilingual-e5-large-instruct", precision="auto")
 retriever = document_processor.get_retriever()
+embeddings = document_processor.get_embeddings()
+# Answers depend on whether web search was allowed, so each setting gets its own cache
+semantic_caches = {
+	web_search_enabled: SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL)
+	for web_search_enabled in (True, False)
+} if SEMANTIC_CACHE_ENABLED else None
 print("Initializing LLM model and web search tool...")
-llm_model = LlmModel("hf.co/safe049/mistral-v0.3-7b-cybersecurity:latest", "json")
+llm_model = LlmModel("hf.co/safe049/mistral-v0.3-7b-cybersecurity:latest", "json", keep_alive=-1)
+print("Warming up the LLM model...")
+llm_model.warm_up()
 web_search_tool = TavilySearch().web_search_tool
 
 print("Initializing CyberRAGLLM FastAPI...")
@@ -80,6 +75,199 @@ def create_control_flow(web_search_enabled=True):
 	control_flow_state = ControlFlowState(llm_model, retriever, web_search_tool, web_search_enabled)
 	return control_flow_state.build_graph()
 
+# Compile the graph of both web search settings once instead of on every request
+graphs = {
+	web_search_enabled: create_control_flow(web_search_enabled)
+	for web_search_enabled in (True, False)
+}
+
+def parse_chat_completion_request(body: bytes) -> dict:
+	"""
+	Parse the body of a chat completion request.
+
+	Only the fields used by the endpoint are read and checked, instead of validating the
+	whole request, including every message of the history, through Pydantic models.
+
+	Args:
+		body (bytes): The raw JSON body of the request.
+
+	Returns:
+		dict: The model, the question taken from the last user message, and the
+		stream, max_retries, web_search_enabled and semantic_cache settings.
+
+	Raises:
+		HTTPException: If the body is not a valid chat completion request.
+	"""
+	try:
+		payload = orjson.loads(body)
+	except orjson.JSONDecodeError:
+		raise HTTPException(status_code=400, detail="The request body is not valid JSON")
+	if not isinstance(payload, dict) or not isinstance(payload.get("model"), str) or not isinstance(payload.get("messages"), list):
+		raise HTTPException(status_code=400, detail="The request must contain a model and a list of messages")
+
+	# Extract the question from the last user message
+	question = next(
+		(message.get("content") for message in reversed(payload["messages"]) if isinstance(message, dict) and message.get("role") == "user"),
+		None
+	)
+	if not isinstance(question, str):
+		raise HTTPException(status_code=400, detail="No user message found in the request")
+
+	max_retries = payload.get("max_retries")
+	# bool is a subclass of int, but true is not a number of retries
+	if max_retries is not None and (not isinstance(max_retries, int) or isinstance(max_retries, bool) or max_retries < 0):
+		raise HTTPException(status_code=400, detail="max_retries must be a non-negative integer")
+	settings = {"stream": False, "web_search_enabled": True, "semantic_cache": True}
+	for name, default in settings.items():
+		value = payload.get(name)
+		if value is not None and not isinstance(value, bool):
+			raise HTTPException(status_code=400, detail=f"{name} must be a boolean")
+		settings[name] = default if value is None else value
+	return {
+		"model": payload["model"],
+		"question": question,
+		"max_retries": 3 if max_retries is None else max_retries,
+		**settings
+	}
+
+def build_chat_completion(model: str, question: str, answer_content: str) -> dict:
+	"""
+	Build a chat completion payload in the OpenAI format.
+
+	The payload is built from trusted server-side data, so it is a plain dict that
+	is serialized directly instead of being validated through a Pydantic model.
+
+	Args:
+		model (str): The model name requested by the client.
+		question (str): The user's question.
+		answer_content (str): The generated answer.
+
+	Returns:
+		dict: The chat completion payload.
+	"""
+	return {
+		"id": f"chatcmpl-{os.urandom(4).hex()}",
+		"object": "chat.completion",
+		"created": int(time.time()),
+		"model": model,
+		"choices": [
+			{
+				"index": 0,
+				"message": {
+					"role": "assistant",
+					"content": answer_content
+				},
+				"finish_reason": "stop"
+			}
+		],
+		"usage": {
+			"prompt_tokens": len(question),
+			"completion_tokens": len(answer_content),
+			"total_tokens": (len(question) + len(answer_content))
+		}
+	}
+
+def build_chat_completion_chunk(completion_id: str, created: int, model: str, delta: dict, finish_reason: Optional[str] = None) -> bytes:
+	"""
+	Build a chat completion chunk as an OpenAI server-sent event.
+
+	Args:
+		completion_id (str): The id shared by every chunk of the completion.
+		created (int): The creation timestamp shared by every chunk of the completion.
+		model (str): The model name requested by the client.
+		delta (dict): The message delta carried by the chunk.
+		finish_reason (str, optional): The reason the completion finished, for the last chunk.
+
+	Returns:
+		bytes: The server-sent event of the chunk.
+	"""
+	chunk = {
+		"id": completion_id,
+		"object": "chat.completion.chunk",
+		"created": created,
+		"model": model,
+		"choices": [
+			{
+				"index": 0,
+				"delta": delta,
+				"finish_reason": finish_reason
+			}
+		]
+	}
+	return b"data: " + orjson.dumps(chunk) + b"\n\n"
+
+def is_cacheable(result: dict) -> bool:
+	"""
+	Check if the answer of a graph run can be served again from the semantic cache.
+
+	The answers the graph gave up on after max retries are not worth serving again,
+	while the answers graded useful are, even on the last allowed attempt.
+
+	Args:
+		result (dict): The final state of the graph run.
+
+	Returns:
+		bool: True if the answer can be cached, False otherwise.
+	"""
+	return not result.get("gave_up", False)
+
+async def answer_question(graph: CompiledStateGraph, state: dict, semantic_cache: Optional[SemanticCache], question_embedding: Optional[List[float]]) -> str:
+	"""
+	Answer a question with the graph, and cache the answer when it can be served again.
+
+	Args:
+		graph (CompiledStateGraph): The graph to run.
+		state (dict): The initial graph state.
+		semantic_cache (SemanticCache, optional): The cache to store the answer in.
+		question_embedding (List[float], optional): The embedding of the question, None when the answer is not cached.
+
+	Returns:
+		str: The answer content.
+	"""
+	result = await graph.ainvoke(state)
+
+	# Extract the answer
+	answer = result.get('generation', 'No answer generated.')
+	answer_content = answer.text()
+	if question_embedding is not None and is_cacheable(result):
+		semantic_cache.put(question_embedding, answer_content)
+	return answer_content
+
+async def stream_chat_completion(model: str, graph: CompiledStateGraph, state: Optional[dict], answer_content: Optional[str], semantic_cache: Optional[SemanticCache], question_embedding: Optional[List[float]]) -> AsyncIterator[bytes]:
+	"""
+	Stream a chat completion as OpenAI server-sent events.
+
+	A streamed answer goes through the same grading, retries and web search fallback
+	as a non-streamed one, so it is only sent once the graph settled on an accepted
+	generation, as streamed tokens cannot be taken back. The response is already
+	started while the graph runs, so its errors are sent as an error event.
+
+	Args:
+		model (str): The model name requested by the client.
+		graph (CompiledStateGraph): The graph to run.
+		state (dict, optional): The initial graph state, unused when the answer is already known.
+		answer_content (str, optional): A cached answer to stream instead of running the graph.
+		semantic_cache (SemanticCache, optional): The cache to store the answer in.
+		question_embedding (List[float], optional): The embedding of the question, None when the answer is not cached.
+
+	Yields:
+		bytes: The server-sent events of the completion.
+	"""
+	completion_id = f"chatcmpl-{os.urandom(4).hex()}"
+	created = int(time.time())
+	yield build_chat_completion_chunk(completion_id, created, model, {"role": "assistant", "content": ""})
+	try:
+		if answer_content is None:
+			answer_content = await answer_question(graph, state, semantic_cache, question_embedding)
+	except Exception as e:
+		error = {"error": {"message": f"Error processing request: {str(e)}", "type": "server_error"}}
+		yield b"data: " + orjson.dumps(error) + b"\n\n"
+		yield b"data: [DONE]\n\n"
+		return
+	yield build_chat_completion_chunk(completion_id, created, model, {"content": answer_content})
+	yield build_chat_completion_chunk(completion_id, created, model, {}, "stop")
+	yield b"data: [DONE]\n\n"
+
 @app.get("/")
 async def root():
 	"""Root endpoint that returns basic API information."""
@@ -91,8 +279,8 @@ async def root():
 		}
 	}
 
-@app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def create_chat_completion(request: ChatCompletionRequest):
+@app.post("/v1/chat/completions", response_class=ORJSONResponse)
+async def create_chat_completion(request: Request):
 	"""
 	OpenAI-compatible chat completions endpoint.
 
@@ -101,57 +289,52 @@ async def create_chat_completion(request: ChatCompletionRequest):
 	in the format expected by OpenAI API clients.
 	"""
 	try:
-		# Extract the question from the last user message
-		user_messages = [msg for msg in request.messages if msg.role == "user"]
-		if not user_messages:
-			raise HTTPException(status_code=400, detail="No user message found in the request")
-
-		question = user_messages[-1].content
-
-		# Initialize state
-		state = {
-			"question": question,
-			"documents": [],
-			"web_search": "No",
-			"max_retries": request.max_retries,
-			"loop_step": 0,
-			"generation": "",
-			"answers": 0
-		}
+		chat_request = parse_chat_completion_request(await request.body())
+		question = chat_request["question"]
 
-		# Create a new graph with the specified web search setting
-		graph = create_control_flow(request.web_search_enabled)
+		# Serve near-identical questions from the semantic cache, unless the request bypasses it
+		semantic_cache = None
+		if semantic_caches is not None and chat_request["semantic_cache"]:
+			semantic_cache = semantic_caches[chat_request["web_search_enabled"]]
+		question_embedding = None
+		answer_content = None
+		if semantic_cache is not None and embeddings is not None:
+			question_embedding = await embeddings.aembed_query(question)
+			answer_content = semantic_cache.get(question_embedding)
 
-		# Run the graph
-		result = graph.invoke(state)
+		state = None
+		if answer_content is None:
+			# Initialize state
+			state = {
+				"question": question,
+				"documents": [],
+				"docs_txt": "",
+				"web_search": "No",
+				"max_retries": chat_request["max_retries"],
+				"loop_step": 0,
+				"generation": "",
+				"answers": 0,
+				"gave_up": False
+			}
 
-		# Extract the answer
-		answer = result.get('generation', 'No answer generated.')
-		answer_content = answer.text()
+		# Pick the precompiled graph of the specified web search setting
+		graph = graphs[chat_request["web_search_enabled"]]
 
-		# Create response in OpenAI format
-		response = ChatCompletionResponse(
-			id=f"chatcmpl-{os.urandom(4).hex()}",
-			created=int(__import__('time').time()),
-			model=request.model,
-			choices=[
-				ChatCompletionChoice(
-					index=0,
-					message=Message(
-						role="assistant",
-						content=answer_content
-					)
-				)
-			],
-			usage=ChatCompletionUsage(
-				prompt_tokens=len(question),
-				completion_tokens=len(answer_content),
-				total_tokens=(len(question) + len(answer_content))
+		if chat_request["stream"]:
+			return StreamingResponse(
+				stream_chat_completion(chat_request["model"], graph, state, answer_content, semantic_cache, question_embedding),
+				media_type="text/event-stream"
 			)
-		)
 
-		return response
+		if answer_content is None:
+			# Run the graph
+			answer_content = await answer_question(graph, state, semantic_cache, question_embedding)
+
+		# Create response in OpenAI format
+		return ORJSONResponse(content=build_chat_completion(chat_request["model"], question, answer_content))
 
+	except HTTPException:
+		raise
 	except Exception as e:
 		raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
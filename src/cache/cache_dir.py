@@ -0,0 +1,52 @@
+"""
+Module for locating the on-disk cache of the CyberRAGLLM application.
+
+This module provides the directory under which artifacts that are expensive to
+rebuild, such as exported embedding models, are kept between runs, and the atomic
+writes of the entries of the on-disk caches.
+"""
+
+import os
+import tempfile
+
+
+def get_cache_dir(*names: str) -> str:
+	"""
+	Get a directory of the application cache, creating it if needed.
+
+	The cache lives under the CYBERRAGLLM_CACHE_DIR environment variable when set,
+	and under ~/.cache/cyberragllm otherwise.
+
+	Args:
+		*names (str): The path components of the directory inside the cache.
+
+	Returns:
+		str: The path of the directory.
+	"""
+	root = os.environ.get("CYBERRAGLLM_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "cyberragllm")
+	path = os.path.join(root, *names)
+	os.makedirs(path, exist_ok=True)
+	return path
+
+
+def write_atomic(path: str, content: str):
+	"""
+	Write a UTF-8 text file atomically.
+
+	The content is written to a temporary file in the same directory, then moved in
+	place, so that concurrent readers never read a partially written file. The
+	temporary file is removed if the write fails, e.g. when the disk is full.
+
+	Args:
+		path (str): The path of the file.
+		content (str): The content of the file.
+	"""
+	file = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path), suffix=".tmp", delete=False)
+	try:
+		# Closing the file flushes its buffer, which can fail as well
+		with file:
+			file.write(content)
+		os.replace(file.name, path)
+	except BaseException:
+		os.unlink(file.name)
+		raise
@@ -0,0 +1,98 @@
+"""
+Module for caching query embeddings in the CyberRAGLLM application.
+
+This module provides a wrapper around a LangChain embedding model that memoizes
+the embeddings of queries, so that a question embedded once (e.g. by the semantic
+answer cache) is not run through the embedding model again by the retriever.
+"""
+
+import asyncio
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.cache.lru_cache import LruCache, hash_key
+
+
+def normalize_query(text: str) -> str:
+	"""
+	Normalize a query by stripping it and collapsing its runs of whitespace.
+
+	Args:
+		text (str): The query to normalize.
+
+	Returns:
+		str: The normalized query.
+	"""
+	return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+	"""
+	An embedding model wrapper caching the embeddings of queries.
+
+	Query embeddings are kept in an LRU cache keyed by a BLAKE2b digest of the query
+	and stored as float32 arrays to keep each entry small. Queries are embedded with
+	their whitespace collapsed, so that queries differing only by spacing share an
+	entry. Their case is kept as it changes the embedding of cased models. Document embeddings are
+	delegated to the wrapped model as they are computed only once per document.
+
+	Attributes:
+		embeddings (Embeddings): The wrapped embedding model.
+	"""
+	def __init__(self, embeddings: Embeddings, max_size: int = 10000):
+		"""
+		Initialize the CachedEmbeddings.
+
+		Args:
+			embeddings (Embeddings): The embedding model to wrap.
+			max_size (int, optional): Maximum number of cached query embeddings.
+		"""
+		self.embeddings = embeddings
+		self._query_cache = LruCache(max_size=max_size)
+
+	def embed_documents(self, texts: List[str]) -> List[List[float]]:
+		"""
+		Embed documents with the wrapped embedding model.
+
+		Args:
+			texts (List[str]): The documents to embed.
+
+		Returns:
+			List[List[float]]: The embeddings of the documents.
+		"""
+		return self.embeddings.embed_documents(texts)
+
+	def embed_query(self, text: str) -> List[float]:
+		"""
+		Embed a query, reusing its cached embedding if it was already embedded.
+
+		Args:
+			text (str): The query to embed.
+
+		Returns:
+			List[float]: The embedding of the query.
+		"""
+		text = normalize_query(text)
+		key = hash_key(text)
+		embedding = self._query_cache.get(key)
+		if embedding is None:
+			embedding = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+			self._query_cache.put(key, embedding)
+		return embedding.tolist()
+
+	async def aembed_query(self, text: str) -> List[float]:
+		"""
+		Embed a query asynchronously, running the embedding model in a worker thread on cache misses.
+
+		Args:
+			text (str): The query to embed.
+
+		Returns:
+			List[float]: The embedding of the query.
+		"""
+		embedding = self._query_cache.get(hash_key(normalize_query(text)))
+		if embedding is not None:
+			return embedding.tolist()
+		return await asyncio.to_thread(self.embed_query, text)
@@ -0,0 +1,148 @@
+"""
+Module for caching the content extracted from documents on disk.
+
+This module provides a content-addressed cache of the text extracted from source
+files, so that a file already parsed by a previous run, whatever its path or URL,
+is read back from the cache instead of being parsed again.
+"""
+
+import hashlib
+import os
+import threading
+from typing import List, Optional, Union
+
+from src.cache.cache_dir import get_cache_dir, write_atomic
+
+# Environment variable disabling the extraction caches when set to "0"
+ENABLED_ENV_VAR = "CYBERRAGLLM_EXTRACTION_CACHE"
+# Environment variable setting the maximum size of every extraction cache, in bytes
+MAX_BYTES_ENV_VAR = "CYBERRAGLLM_EXTRACTION_CACHE_MAX_BYTES"
+# Default maximum size of every extraction cache, in bytes
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def hash_content(source: Union[str, bytes]) -> str:
+	"""
+	Compute the SHA-256 digest of a file or of its content.
+
+	Args:
+		source (Union[str, bytes]): The path of the file, or its content.
+
+	Returns:
+		str: The hex digest of the content.
+	"""
+	if isinstance(source, bytes):
+		return hashlib.sha256(source).hexdigest()
+	digest = hashlib.sha256()
+	with open(source, "rb") as file:
+		for chunk in iter(lambda: file.read(1 << 20), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+class ExtractionCache:
+	"""
+	An on-disk cache of extracted content, keyed by the digest of the source content.
+
+	Every entry is a UTF-8 text file named after the digest and a variant, which
+	identifies the extraction settings and version, so that changing them does not
+	return content extracted differently. Once the entries exceed the size cap, the
+	least recently used ones are removed, e.g. those of older versions of a document.
+
+	The cache is disabled by setting the CYBERRAGLLM_EXTRACTION_CACHE environment
+	variable to "0", and its size cap is set in bytes by CYBERRAGLLM_EXTRACTION_CACHE_MAX_BYTES.
+
+	Attributes:
+		cache_dir (str): Directory of the cached content, None when the cache is disabled.
+		max_bytes (int): Maximum total size of the entries, in bytes.
+	"""
+	def __init__(self, name: str, enabled: Optional[bool] = None, max_bytes: Optional[int] = None):
+		"""
+		Initialize the ExtractionCache.
+
+		Args:
+			name (str): Name of the cache directory inside the application cache.
+			enabled (bool, optional): Whether to cache the content, the environment setting by default.
+			max_bytes (int, optional): Maximum total size of the entries, the environment setting by default.
+		"""
+		if enabled is None:
+			enabled = os.environ.get(ENABLED_ENV_VAR, "1") != "0"
+		self.cache_dir = get_cache_dir(name) if enabled else None
+		self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get(MAX_BYTES_ENV_VAR, DEFAULT_MAX_BYTES))
+		# Total size of the entries, measured on the first store
+		self._size = None
+		self._lock = threading.Lock()
+
+	def _path(self, digest: str, variant: str) -> str:
+		"""Get the path of the entry of a digest and a variant."""
+		return os.path.join(self.cache_dir, f"{digest}-{variant}.txt")
+
+	def _entries(self) -> List[os.DirEntry]:
+		"""Get the entries of the cache directory, leaving out the temporary files being written."""
+		with os.scandir(self.cache_dir) as entries:
+			return [entry for entry in entries if entry.name.endswith(".txt") and entry.is_file()]
+
+	def _prune(self):
+		"""Remove the least recently used entries until the entries fit in 80% of the size cap."""
+		entries = []
+		for entry in self._entries():
+			try:
+				stat = entry.stat()
+			except FileNotFoundError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, entry.path))
+		self._size = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if self._size <= self.max_bytes * 0.8:
+				break
+			try:
+				os.unlink(path)
+			except FileNotFoundError:
+				pass
+			self._size -= size
+
+	def get(self, digest: str, variant: str) -> Optional[str]:
+		"""
+		Get the content extracted from a source.
+
+		Args:
+			digest (str): The digest of the source content.
+			variant (str): The extraction settings and version.
+
+		Returns:
+			str: The extracted content, or None if it is not cached.
+		"""
+		if self.cache_dir is None:
+			return None
+		path = self._path(digest, variant)
+		try:
+			with open(path, "r", encoding="utf-8") as file:
+				content = file.read()
+		except FileNotFoundError:
+			return None
+		# Mark the entry as recently used for the pruning
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return content
+
+	def put(self, digest: str, variant: str, content: str):
+		"""
+		Store the content extracted from a source, written atomically.
+
+		Args:
+			digest (str): The digest of the source content.
+			variant (str): The extraction settings and version.
+			content (str): The extracted content.
+		"""
+		if self.cache_dir is None:
+			return
+		write_atomic(self._path(digest, variant), content)
+		with self._lock:
+			if self._size is None:
+				self._prune()
+			else:
+				self._size += len(content.encode("utf-8"))
+				if self._size > self.max_bytes:
+					self._prune()
@@ -0,0 +1,105 @@
+"""
+Module for caching values in memory with least recently used eviction.
+
+This module provides a small thread-safe LRU cache and a helper to build compact
+content-addressed keys, used to memoize deterministic LLM decisions and other
+expensive computations in the CyberRAGLLM application.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List
+
+
+def hash_key(*parts: str) -> bytes:
+	"""
+	Build a compact cache key from strings.
+
+	The parts are hashed with BLAKE2b, which is faster than SHA-256 and strong
+	enough for cache keys that do not need cryptographic guarantees.
+
+	Args:
+		*parts (str): The strings identifying the cached value.
+
+	Returns:
+		bytes: A 16 bytes digest of the parts.
+	"""
+	return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).digest()
+
+
+def hash_keys(prefix: str, suffixes: Iterable[str]) -> List[bytes]:
+	"""
+	Build the cache keys of several strings sharing the same prefix.
+
+	The prefix is hashed once and its hash state is copied for every suffix, which
+	gives the same keys as hash_key(prefix, suffix) without hashing the prefix again.
+
+	Args:
+		prefix (str): The string shared by every key.
+		suffixes (Iterable[str]): The strings distinguishing the keys.
+
+	Returns:
+		List[bytes]: The 16 bytes digest of every suffix, in order.
+	"""
+	prefix_hash = hashlib.blake2b((prefix + "\0").encode("utf-8"), digest_size=16)
+	keys = []
+	for suffix in suffixes:
+		suffix_hash = prefix_hash.copy()
+		suffix_hash.update(suffix.encode("utf-8"))
+		keys.append(suffix_hash.digest())
+	return keys
+
+
+class LruCache:
+	"""
+	A thread-safe in-memory cache evicting the least recently used entries.
+
+	Attributes:
+		max_size (int): Maximum number of cached entries.
+	"""
+	def __init__(self, max_size: int = 4096):
+		"""
+		Initialize the LruCache.
+
+		Args:
+			max_size (int, optional): Maximum number of cached entries.
+		"""
+		self.max_size = max_size
+		self._entries: OrderedDict = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		"""Get the number of cached entries."""
+		return len(self._entries)
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		"""
+		Get a cached value and mark it as the most recently used.
+
+		Args:
+			key (Hashable): The key of the value.
+			default (Any, optional): The value to return if the key is not cached.
+
+		Returns:
+			Any: The cached value, or the default value if the key is not cached.
+		"""
+		with self._lock:
+			if key not in self._entries:
+				return default
+			self._entries.move_to_end(key)
+			return self._entries[key]
+
+	def put(self, key: Hashable, value: Any):
+		"""
+		Cache a value, evicting the least recently used one if the cache is full.
+
+		Args:
+			key (Hashable): The key of the value.
+			value (Any): The value to cache.
+		"""
+		with self._lock:
+			self._entries[key] = value
+			self._entries.move_to_end(key)
+			if len(self._entries) > self.max_size:
+				self._entries.popitem(last=False)
@@ -0,0 +1,128 @@
+"""
+Module for caching answers by the semantic similarity of their questions.
+
+This module provides an in-memory cache that stores generated answers alongside
+the embedding of the question that produced them. A new question whose embedding
+is close enough to a cached one is answered from the cache, skipping the whole
+graph-based workflow.
+"""
+
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+	"""
+	An in-memory LRU cache with TTL expiry keyed by question embeddings.
+
+	Embeddings are L2-normalized and stored in a preallocated matrix so that a
+	lookup is a single matrix-vector product. Entries are evicted in least
+	recently used order once the cache is full, and evicted once expired. An
+	answer to a question similar enough to a cached one replaces its entry.
+
+	Attributes:
+		threshold (float): Minimum cosine similarity for a cached answer to be returned.
+		max_size (int): Maximum number of cached answers.
+		ttl (float): Time to live of a cached answer, in seconds.
+	"""
+	def __init__(self, threshold: float = 0.95, max_size: int = 1024, ttl: float = 3600):
+		"""
+		Initialize the SemanticCache.
+
+		Args:
+			threshold (float, optional): Minimum cosine similarity for a cached answer to be returned.
+			max_size (int, optional): Maximum number of cached answers.
+			ttl (float, optional): Time to live of a cached answer, in seconds.
+		"""
+		self.threshold = threshold
+		self.max_size = max_size
+		self.ttl = ttl
+		# Slot index -> answer, ordered from least to most recently used
+		self._entries: OrderedDict = OrderedDict()
+		self._free_slots = list(range(max_size - 1, -1, -1))
+		self._vectors: Optional[np.ndarray] = None
+		self._valid = np.zeros(max_size, dtype=bool)
+		self._expires_at = np.zeros(max_size, dtype=np.float64)
+
+	def __len__(self) -> int:
+		"""Get the number of cached answers."""
+		return len(self._entries)
+
+	def _normalize(self, embedding: List[float]) -> np.ndarray:
+		"""L2-normalize an embedding so that a dot product is a cosine similarity."""
+		vector = np.asarray(embedding, dtype=np.float32)
+		norm = np.linalg.norm(vector)
+		return vector / norm if norm > 0 else vector
+
+	def _evict(self, slot: int):
+		"""Remove the answer stored in a slot and free the slot."""
+		del self._entries[slot]
+		self._valid[slot] = False
+		self._free_slots.append(slot)
+
+	def _best_match(self, vector: np.ndarray) -> Optional[int]:
+		"""
+		Find the slot of the unexpired question most similar to a normalized embedding.
+
+		Expired answers are evicted first, so that they never hide a valid answer to a
+		slightly less similar question.
+
+		Args:
+			vector (np.ndarray): The normalized embedding of the question.
+
+		Returns:
+			int: The slot of the most similar question, or None if none is similar enough.
+		"""
+		expired = np.flatnonzero(self._valid & (self._expires_at < time.monotonic()))
+		for slot in expired:
+			self._evict(int(slot))
+		if not self._entries:
+			return None
+		scores = self._vectors @ vector
+		scores[~self._valid] = -np.inf
+		slot = int(np.argmax(scores))
+		return slot if scores[slot] >= self.threshold else None
+
+	def get(self, embedding: List[float]) -> Optional[str]:
+		"""
+		Get the cached answer of the most similar question.
+
+		Args:
+			embedding (List[float]): The embedding of the question.
+
+		Returns:
+			str: The cached answer, or None if no cached question is similar enough.
+		"""
+		if not self._entries:
+			return None
+		slot = self._best_match(self._normalize(embedding))
+		if slot is None:
+			return None
+		self._entries.move_to_end(slot)
+		return self._entries[slot]
+
+	def put(self, embedding: List[float], answer: str):
+		"""
+		Cache an answer for a question, replacing the answer of a question similar enough.
+
+		Args:
+			embedding (List[float]): The embedding of the question.
+			answer (str): The answer to cache.
+		"""
+		vector = self._normalize(embedding)
+		if self._vectors is None:
+			self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+		slot = self._best_match(vector) if self._entries else None
+		if slot is None:
+			if not self._free_slots:
+				# Evict the least recently used answer
+				self._evict(next(iter(self._entries)))
+			slot = self._free_slots.pop()
+		self._vectors[slot] = vector
+		self._valid[slot] = True
+		self._expires_at[slot] = time.monotonic() + self.ttl
+		self._entries[slot] = answer
+		self._entries.move_to_end(slot)
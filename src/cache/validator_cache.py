@@ -0,0 +1,104 @@
+"""
+Module for caching the HTTP validators of downloaded documents on disk.
+
+This module provides a cache of the ETag and Last-Modified headers of the URLs
+downloaded by a previous run, along with the digest of their content, so that the
+next download of a URL can be made conditional and a document that did not change
+is served from the extraction cache instead of being downloaded and parsed again.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import requests
+
+from src.cache.cache_dir import get_cache_dir, write_atomic
+
+# Request header sending back every response header used as a validator
+VALIDATOR_HEADERS = {
+	"ETag": "If-None-Match",
+	"Last-Modified": "If-Modified-Since"
+}
+
+
+class ValidatorCache:
+	"""
+	An on-disk cache of the HTTP validators of downloaded URLs.
+
+	Every entry is a small JSON file named after the digest of the URL, holding the
+	validators of its last response and the digest of the downloaded content.
+
+	Attributes:
+		cache_dir (str): Directory of the cached validators.
+	"""
+	def __init__(self, name: str):
+		"""
+		Initialize the ValidatorCache.
+
+		Args:
+			name (str): Name of the cache directory inside the application cache.
+		"""
+		self.cache_dir = get_cache_dir(name)
+
+	def _path(self, url: str) -> str:
+		"""Get the path of the entry of a URL."""
+		return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+	def get(self, url: str) -> Optional[Dict[str, str]]:
+		"""
+		Get the validators of the last download of a URL.
+
+		Args:
+			url (str): The downloaded URL.
+
+		Returns:
+			Dict[str, str]: The validator headers and the digest of the content, or None
+			if the URL is not cached.
+		"""
+		try:
+			with open(self._path(url), "r", encoding="utf-8") as file:
+				return json.load(file)
+		except (FileNotFoundError, json.JSONDecodeError):
+			return None
+
+	def put(self, url: str, digest: str, response: requests.Response):
+		"""
+		Store the validators of a download, if its response has any, written atomically.
+
+		Args:
+			url (str): The downloaded URL.
+			digest (str): The digest of the downloaded content.
+			response (requests.Response): The response of the download.
+		"""
+		entry = {header: response.headers[header] for header in VALIDATOR_HEADERS if header in response.headers}
+		if not entry:
+			return
+		entry["digest"] = digest
+		write_atomic(self._path(url), json.dumps(entry))
+
+	def delete(self, url: str):
+		"""
+		Remove the validators of a URL, so that its next download is not conditional.
+
+		Args:
+			url (str): The downloaded URL.
+		"""
+		try:
+			os.unlink(self._path(url))
+		except FileNotFoundError:
+			pass
+
+	@staticmethod
+	def conditional_headers(entry: Dict[str, str]) -> Dict[str, str]:
+		"""
+		Get the headers of a request only answered in full if the content changed.
+
+		Args:
+			entry (Dict[str, str]): The cache entry of the URL.
+
+		Returns:
+			Dict[str, str]: The conditional request headers.
+		"""
+		return {request_header: entry[header] for header, request_header in VALIDATOR_HEADERS.items() if header in entry}
@@ -8,9 +8,11 @@ includes steps for routing questions, retrieving documents, grading document
 relevance, generating answers, and checking for hallucinations.
 """
 
-import json
+import asyncio
+import os
 import re
 
+import orjson
 from langchain_community.tools import TavilySearchResults
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.vectorstores import VectorStoreRetriever
@@ -19,6 +21,7 @@ from langgraph.graph import END
 from langchain.schema import Document
 from langgraph.graph.state import CompiledStateGraph
 
+from src.cache.lru_cache import LruCache, hash_key, hash_keys
 from src.graph.graph_state import GraphState
 from src.llm.llm_model import LlmModel
 
@@ -83,16 +86,25 @@ This carefully and objectively assess whether the document contains at least som
 
 Return JSON with single key, binary_score, that is 'yes' or 'no' score to indicate whether the document contains at least some information that is relevant to the question."""
 
-HALLUCINATION_GRADER_INSTRUCTIONS = """You are an expert evaluator in cybersecurity and AI model assessment. Your task is to grade the response of a Large Language Model (LLM) against the FACTS given to you.
+GENERATION_GRADER_INSTRUCTIONS = """You are an expert evaluator in cybersecurity and AI model assessment. Your task is to grade the response of a Large Language Model (LLM) against the FACTS given to you and the QUESTION it answers.
 
-You will be given FACTS and a LLM ANSWER.
+You will be given FACTS, a QUESTION and a LLM ANSWER.
 
-Here is the grade criteria to follow:
+Here is the grade criteria to follow to decide whether the LLM ANSWER is grounded:
 
 (1) Ensure the LLM ANSWER is grounded in the FACTS. 
 
 (2) Ensure the LLM ANSWER does not contain "hallucinated" information outside the scope of the FACTS.
 
+Here are the grade criteria to follow to decide whether the LLM ANSWER addresses the QUESTION:
+
+1. Solution Accuracy: Score based on correctness, with partial correctness considered.
+2. Methodology Used: Is the approach logical, structured, and reproducible?
+3. Reproducibility: Can another person follow the same approach?
+4. Quality of Reasoning: Are the explanations clear, with well-justified choices?
+
+The llm can receive an addresses score of yes if the answer contains extra information that is not explicitly asked for in the question.
+
 Score:
 
 A score of yes means that the llm's answer meets all of the criteria. This is the highest (best) score. 
@@ -103,37 +115,65 @@ Explain your reasoning in a step-by-step manner to ensure your reasoning and con
 
 Avoid simply stating the correct answer at the outset."""
 
-HALLUCINATION_GRADER_PROMPT = """FACTS: \n\n {documents} \n\n LLM ANSWER: {generation}. 
+# Grader prompt
+GENERATION_GRADER_PROMPT = """FACTS: \n\n {documents} \n\n QUESTION: \n\n {question} \n\n LLM ANSWER: {generation}.
 
-Return JSON with two two keys, binary_score is 'yes' or 'no' score to indicate whether the LLM ANSWER is grounded in the FACTS. And a key, explanation, that contains an explanation of the score."""
+Return JSON with three keys, grounded is 'yes' or 'no' score to indicate whether the LLM ANSWER is grounded in the FACTS, addresses is 'yes' or 'no' score to indicate whether the LLM ANSWER meets the criteria for the QUESTION. And a key, explanation, that contains an explanation of the scores."""
 
-ANSWER_GRADER_INSTRUCTIONS ="""You are an expert evaluator in cybersecurity and AI model assessment. Your task is to grade the response of a Large Language Model (LLM).  
+# The instructions never change, so their messages are built once and shared by every call
+_ROUTER_SYSTEM_MESSAGE = SystemMessage(content=ROUTER_INSTRUCTIONS)
+_DOC_GRADER_SYSTEM_MESSAGE = SystemMessage(content=DOC_GRADER_INSTRUCTIONS)
+_GENERATION_GRADER_SYSTEM_MESSAGE = SystemMessage(content=GENERATION_GRADER_INSTRUCTIONS)
 
-You will be given a QUESTION and a LLM ANSWER.
+# Only the document changes between the grader prompts of a request, so the prompt is
+# split around it and the question is formatted once per request
+_DOC_GRADER_PROMPT_PREFIX, _DOC_GRADER_PROMPT_SUFFIX = DOC_GRADER_PROMPT.split("{document}")
+# Share of the question tokens a document must contain to be deemed relevant without the LLM grader
+LEXICAL_RELEVANT_OVERLAP = 0.5
 
-Here are the grade criteria to follow:
+_TOKEN_PATTERN = re.compile(r"\w+")
 
-1. Solution Accuracy: Score based on correctness, with partial correctness considered.
-2. Methodology Used: Is the approach logical, structured, and reproducible?
-3. Reproducibility: Can another person follow the same approach?
-4. Quality of Reasoning: Are the explanations clear, with well-justified choices?
+# Common English words carrying no topical information
+STOPWORDS = frozenset({
+	"a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "could", "do", "does", "for",
+	"from", "how", "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "should", "so",
+	"that", "the", "their", "them", "there", "these", "they", "this", "to", "was", "we", "were",
+	"what", "when", "where", "which", "who", "why", "will", "with", "would", "you", "your"
+})
 
-The llm can receive a score of yes if the answer contains extra information that is not explicitly asked for in the question.
 
-A score of no means that the llm's answer does not meet all of the criteria. This is the lowest possible score you can give.
+def format_docs(docs):
+	return "\n\n".join(doc.page_content for doc in docs)
 
-Explain your reasoning in a step-by-step manner to ensure your reasoning and conclusion are correct. 
+def tokenize(text: str) -> set:
+	"""
+	Split a text into its set of lowercase word tokens.
 
-Avoid simply stating the correct answer at the outset."""
+	Args:
+		text (str): The text to tokenize.
 
-# Grader prompt
-ANSWER_GRADER_PROMPT = """QUESTION: \n\n {question} \n\n LLM ANSWER: {generation}.
+	Returns:
+		set: The distinct lowercase tokens of the text.
+	"""
+	return set(_TOKEN_PATTERN.findall(text.lower()))
 
-Return JSON with two keys, binary_score is 'yes' or 'no' score to indicate whether the LLM ANSWER meets the criteria. And a key, explanation, that contains an explanation of the score."""
+def parse_json_output(content: str) -> dict:
+	"""
+	Parse the JSON output of a router or grader call.
 
+	The model sometimes follows the JSON object with extra text, in which case
+	only the first line of the output is parsed.
 
-def format_docs(docs):
-	return "\n\n".join(doc.page_content for doc in docs)
+	Args:
+		content (str): The content of the model output.
+
+	Returns:
+		dict: The parsed JSON object.
+	"""
+	try:
+		return orjson.loads(content)
+	except orjson.JSONDecodeError:
+		return orjson.loads(content.strip().split("\n", 1)[0])
 
 def sanitize_query(query: str) -> str:
 	"""
@@ -174,6 +214,10 @@ class ControlFlowState:
 		web_search_tool (TavilySearchResults): The web search tool.
 		workflow (StateGraph): The state graph for the workflow.
 	"""
+	# Class-level caches of the deterministic (temperature 0) router and document grader
+	# decisions, shared by the graphs of every web search setting
+	_route_cache = LruCache(max_size=1024)
+	_grade_cache = LruCache(max_size=4096)
 	def __init__(self, llm_model: LlmModel, retriever: VectorStoreRetriever, web_search_tool: TavilySearchResults, web_search_enabled: bool = True):
 		self.llm_model = llm_model
 		self.retriever = retriever
@@ -181,7 +225,7 @@ class ControlFlowState:
 		self.web_search_enabled = web_search_enabled
 		self.workflow = StateGraph(GraphState)
 
-	def retrieve_documents(self, state):
+	async def retrieve_documents(self, state):
 		"""
 		Retrieve documents from the vectorstore
 
@@ -197,11 +241,11 @@ class ControlFlowState:
 		# Write retrieved documents to documents key in state
 		if self.retriever is None:
 			print("No retriever found")
-			return {"documents": []}
-		documents = self.retriever.invoke(question)
-		return {"documents": documents}
+			return {"documents": [], "docs_txt": ""}
+		documents = await self.retriever.ainvoke(question)
+		return {"documents": documents, "docs_txt": ""}
 
-	def generate_answer(self, state):
+	async def generate_answer(self, state):
 		"""
 		Generate answer using RAG on retrieved documents
 
@@ -209,24 +253,49 @@ class ControlFlowState:
 			state (dict): The current graph state
 
 		Returns:
-			state (dict): New key added to state, generation, that contains LLM generation
+			state (dict): New key added to state, generation, that contains LLM generation,
+			and docs_txt, that contains the joined documents reused by the graders and retries
 		"""
 		print("---GENERATE---")
 		question = state["question"]
 		documents = state["documents"]
 		loop_step = state.get("loop_step", 0)
 
-		# RAG generation
-		docs_txt = format_docs(documents)
+		# RAG generation, the documents are only joined again when they changed since the last generation
+		docs_txt = state.get("docs_txt") or format_docs(documents)
 		rag_prompt_formatted = RAG_PROMPT.format(context=docs_txt, question=question)
-		generation = self.llm_model.model.invoke([HumanMessage(content=rag_prompt_formatted)])
-		return {"generation": generation, "loop_step": loop_step + 1}
+		generation = await self.llm_model.model.ainvoke([HumanMessage(content=rag_prompt_formatted)])
+		return {"generation": generation, "loop_step": loop_step + 1, "docs_txt": docs_txt}
+
+	async def _grade_document(self, content: str, prompt_suffix: str, semaphore: asyncio.Semaphore) -> str:
+		"""
+		Grade the relevance of a single document with the LLM grader
+
+		Args:
+			content (str): The content of the document
+			prompt_suffix (str): The grader prompt following the document, with the question formatted in
+			semaphore (asyncio.Semaphore): Bounds the number of concurrent grader calls
+
+		Returns:
+			str: The binary score of the document, 'yes' or 'no'
+		"""
+		async with semaphore:
+			result = await self.llm_model.model_formatted.ainvoke(
+				[_DOC_GRADER_SYSTEM_MESSAGE, HumanMessage(content=_DOC_GRADER_PROMPT_PREFIX + content + prompt_suffix)]
+			)
+		return parse_json_output(result.content)["binary_score"]
 
-	def grade_documents(self, state):
+	async def grade_documents(self, state):
 		"""
 		Determines whether the retrieved documents are relevant to the question
 		If any document is not relevant, we will set a flag to run web search
 
+		Grades already given to a document for the same question are reused, and the
+		documents sharing either none or most of the question keywords are graded by
+		their lexical overlap alone. Only the remaining documents are graded by the LLM,
+		concurrently, so the grading latency is bound by the slowest grader call
+		instead of the sum of all of them.
+
 		Args:
 			state (dict): The current graph state
 
@@ -242,17 +311,33 @@ class ControlFlowState:
 		filtered_docs = []
 		if len(documents) == 0:
 			print("No documents found, running web search")
-			return {"documents": [], "web_search": "yes"}
+			return {"documents": [], "docs_txt": "", "web_search": "yes"}
 		web_search = "no"
-		for d in documents:
-			doc_grader_prompt_formatted = DOC_GRADER_PROMPT.format(
-				document=d.page_content, question=question
-			)
-			result = self.llm_model.model_formatted.invoke(
-				[SystemMessage(content=DOC_GRADER_INSTRUCTIONS)]
-				+ [HumanMessage(content=doc_grader_prompt_formatted)]
-			)
-			grade = json.loads(result.content)["binary_score"]
+		keys = hash_keys(question, (d.page_content for d in documents))
+		grades = [self._grade_cache.get(key) for key in keys]
+
+		# Settle the clear-cut documents with a cheap lexical overlap before asking the LLM
+		question_tokens = tokenize(question) - STOPWORDS
+		if question_tokens:
+			for i, d in enumerate(documents):
+				if grades[i] is None:
+					overlap = len(question_tokens & tokenize(d.page_content)) / len(question_tokens)
+					if overlap >= LEXICAL_RELEVANT_OVERLAP:
+						grades[i] = "yes"
+					elif overlap == 0:
+						grades[i] = "no"
+
+		# Grade the remaining documents concurrently, up to the parallelism Ollama is configured for
+		misses = [i for i, grade in enumerate(grades) if grade is None]
+		prompt_suffix = _DOC_GRADER_PROMPT_SUFFIX.format(question=question)
+		semaphore = asyncio.Semaphore(int(os.environ.get("GRADER_PARALLEL", os.environ.get("OLLAMA_NUM_PARALLEL", "8"))))
+		results = await asyncio.gather(
+			*(self._grade_document(documents[i].page_content, prompt_suffix, semaphore) for i in misses)
+		)
+		for i, grade in zip(misses, results):
+			grades[i] = grade
+			self._grade_cache.put(keys[i], grade)
+		for d, grade in zip(documents, grades):
 			# Document relevant
 			if grade.lower() == "yes":
 				print("---GRADE: DOCUMENT RELEVANT---")
@@ -264,9 +349,22 @@ class ControlFlowState:
 				# We set a flag to indicate that we want to run web search
 				web_search = "yes"
 				continue
-		return {"documents": filtered_docs, "web_search": web_search}
+		return {"documents": filtered_docs, "docs_txt": "", "web_search": web_search}
 
-	def web_search(self, state):
+	def give_up(self, state):
+		"""
+		Mark the generation as the one the graph gave up on after max retries
+
+		Args:
+			state (dict): The current graph state
+
+		Returns:
+			state (dict): Updates gave_up key
+		"""
+		print("---GIVING UP ON THE GENERATION---")
+		return {"gave_up": True}
+
+	async def web_search(self, state):
 		"""
 		Web search based based on the question
 
@@ -282,13 +380,13 @@ class ControlFlowState:
 		documents = state.get("documents", [])
 
 		# Web search
-		docs = self.web_search_tool.invoke({"query": sanitize_query(question)})
+		docs = await self.web_search_tool.ainvoke({"query": sanitize_query(question)})
 		web_results = "\n".join([d["content"] for d in docs if "content" in d])
 		web_results = Document(page_content=web_results)
-		documents.append(web_results)
-		return {"documents": documents}
+		# Return a new list rather than mutating the one held by the current state
+		return {"documents": documents + [web_results], "docs_txt": ""}
 
-	def route_question(self, state):
+	async def route_question(self, state):
 		"""
 		Route question to web search or RAG
 
@@ -301,25 +399,23 @@ class ControlFlowState:
 
 		print("---ROUTE QUESTION---")
 
-		# If web search is disabled, always route to vectorstore
-		if not self.web_search_enabled:
-			print("---WEB SEARCH DISABLED, ROUTING TO RAG---")
+		# Reuse the decision already taken for the same question
+		key = hash_key(state["question"])
+		source = self._route_cache.get(key)
+		if source is None:
+			route_question = await self.llm_model.model_formatted.ainvoke(
+				[_ROUTER_SYSTEM_MESSAGE, HumanMessage(content=state["question"])]
+			)
+			print(route_question.content)
+			json_content = parse_json_output(route_question.content)
+			source = json_content.get("datasource")
+			self._route_cache.put(key, source)
+		if source == "websearch":
+			print("---ROUTE QUESTION TO WEB SEARCH---")
+			return "websearch"
+		elif source == "vectorstore":
+			print("---ROUTE QUESTION TO RAG---")
 			return "vectorstore"
-
-		route_question = self.llm_model.model_formatted.invoke(
-			[SystemMessage(content=ROUTER_INSTRUCTIONS)]
-			+ [HumanMessage(content=state["question"])]
-		)
-		print(route_question.content)
-		json_content = json.loads(route_question.content)
-		if "datasource" in json_content:
-			source = json_content["datasource"]
-			if source == "websearch":
-				print("---ROUTE QUESTION TO WEB SEARCH---")
-				return "websearch"
-			elif source == "vectorstore":
-				print("---ROUTE QUESTION TO RAG---")
-				return "vectorstore"
 		return "websearch"
 
 	def decide_to_generate(self, state):
@@ -336,11 +432,6 @@ class ControlFlowState:
 		print("---ASSESS GRADED DOCUMENTS---")
 		web_search = state["web_search"]
 
-		# If web search is disabled, always generate
-		if not self.web_search_enabled:
-			print("---WEB SEARCH DISABLED, PROCEEDING TO GENERATE---")
-			return "generate"
-
 		if web_search.lower() == "yes":
 			# All documents have been filtered check_relevance
 			# We will re-generate a new query
@@ -354,7 +445,7 @@ class ControlFlowState:
 			return "generate"
 
 
-	def grade_generation_v_documents_and_question(self, state):
+	async def grade_generation_v_documents_and_question(self, state):
 		"""
 		Determines whether the generation is grounded in the document and answers question
 
@@ -367,34 +458,25 @@ class ControlFlowState:
 
 		print("---CHECK HALLUCINATIONS---")
 		question = state["question"]
-		documents = state["documents"]
+		docs_txt = state["docs_txt"]
 		generation = state["generation"]
 		max_retries = state.get("max_retries", 3)  # Default to 3 if not provided
 
-		hallucination_grader_prompt_formatted = HALLUCINATION_GRADER_PROMPT.format(
-			documents=format_docs(documents), generation=generation.content
+		# Grade groundedness and usefulness with a single grader call
+		generation_grader_prompt_formatted = GENERATION_GRADER_PROMPT.format(
+			documents=docs_txt, question=question, generation=generation.content
 		)
-		result = self.llm_model.model_formatted.invoke(
-			[SystemMessage(content=HALLUCINATION_GRADER_INSTRUCTIONS)]
-			+ [HumanMessage(content=hallucination_grader_prompt_formatted)]
+		result = await self.llm_model.model_formatted.ainvoke(
+			[_GENERATION_GRADER_SYSTEM_MESSAGE, HumanMessage(content=generation_grader_prompt_formatted)]
 		)
-		grade = json.loads(result.content)["binary_score"]
+		grades = parse_json_output(result.content)
 
 		# Check hallucination
-		if grade == "yes":
+		if grades.get("grounded") == "yes":
 			print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
 			# Check question-answering
 			print("---GRADE GENERATION vs QUESTION---")
-			# Test using question and generation from above
-			answer_grader_prompt_formatted = ANSWER_GRADER_PROMPT.format(
-				question=question, generation=generation.content
-			)
-			result = self.llm_model.model_formatted.invoke(
-				[SystemMessage(content=ANSWER_GRADER_INSTRUCTIONS)]
-				+ [HumanMessage(content=answer_grader_prompt_formatted)]
-			)
-			grade = json.loads(result.content)["binary_score"]
-			if grade == "yes":
+			if grades.get("addresses") == "yes":
 				print("---DECISION: GENERATION ADDRESSES QUESTION---")
 				return "useful"
 			elif state["loop_step"] <= max_retries:
@@ -417,40 +499,60 @@ class ControlFlowState:
 	def build_graph(self) -> CompiledStateGraph:
 		"""
 		Build the graph for the control flow
+
+		The nodes and routers doing I/O are coroutines, so the compiled graph
+		must be run with ainvoke or astream.
+
+		When web search is disabled, the graph has neither a router nor a web search
+		node: questions go straight to retrieval and graded documents straight to
+		generation, so no LLM call is spent on a routing decision that cannot be honored.
+
+		Returns:
+			CompiledStateGraph: The compiled graph.
 		"""
 		workflow = self.workflow
-		workflow.add_node("websearch", self.web_search)  # web search
+		if self.web_search_enabled:
+			workflow.add_node("websearch", self.web_search)  # web search
 		workflow.add_node("retrieve", self.retrieve_documents)  # retrieve
 		workflow.add_node("grade_documents", self.grade_documents)  # grade documents
 		workflow.add_node("generate", self.generate_answer)  # generate
+		workflow.add_node("give_up", self.give_up)  # give up after max retries
 
 		# Build graph
-		workflow.set_conditional_entry_point(
-			self.route_question,
-			{
-				"websearch": "websearch",
-				"vectorstore": "retrieve",
-			},
-		)
-		workflow.add_edge("websearch", "generate")
 		workflow.add_edge("retrieve", "grade_documents")
-		workflow.add_conditional_edges(
-			"grade_documents",
-			self.decide_to_generate,
-			{
-				"websearch": "websearch",
-				"generate": "generate",
-			},
-		)
+		if self.web_search_enabled:
+			workflow.set_conditional_entry_point(
+				self.route_question,
+				{
+					"websearch": "websearch",
+					"vectorstore": "retrieve",
+				},
+			)
+			workflow.add_edge("websearch", "generate")
+			workflow.add_conditional_edges(
+				"grade_documents",
+				self.decide_to_generate,
+				{
+					"websearch": "websearch",
+					"generate": "generate",
+				},
+			)
+		else:
+			workflow.set_entry_point("retrieve")
+			workflow.add_edge("grade_documents", "generate")
+
+		generation_routes = {
+			"not supported": "generate",
+			"useful": END,
+			"max retries": "give_up",
+		}
+		if self.web_search_enabled:
+			generation_routes["not useful"] = "websearch"
 		workflow.add_conditional_edges(
 			"generate",
 			self.grade_generation_v_documents_and_question,
-			{
-				"not supported": "generate",
-				"useful": END,
-				"not useful": "websearch",
-				"max retries": END,
-			},
+			generation_routes,
 		)
+		workflow.add_edge("give_up", END)
 		graph = workflow.compile()
 		return graph
@@ -28,6 +28,8 @@ class GraphState(TypedDict):
 		answers (int): Number of answers generated.
 		loop_step (int): Current step in the loop, annotated with operator.add.
 		documents (List[str]): List of retrieved documents.
+		docs_txt (str): The documents joined into the generation context, empty when the documents changed since.
+		gave_up (bool): Whether the graph ended on max retries rather than on an answer graded useful.
 	"""
 
 	question: str
@@ -37,3 +39,5 @@ class GraphState(TypedDict):
 	answers: int
 	loop_step: Annotated[int, operator.add]
 	documents: List[str]
+	docs_txt: str
+	gave_up: bool
@@ -5,6 +5,9 @@ This module provides a wrapper around the ChatOllama model to simplify
 initialization and access to different configurations of the model.
 """
 
+from typing import Optional, Union
+
+from langchain_core.messages import HumanMessage
 from langchain_ollama import ChatOllama
 
 class LlmModel:
@@ -17,21 +20,25 @@ class LlmModel:
 	Attributes:
 		model_name (str): The name of the language model to use.
 		model_format (str): The format for model output (e.g., "json").
+		keep_alive (int | str | None): How long Ollama keeps the model loaded after a request.
 		model (ChatOllama): The standard ChatOllama model instance.
 		model_formatted (ChatOllama): The ChatOllama model instance with formatting options.
 	"""
-	def __init__(self, model_name: str, model_format: str):
+	def __init__(self, model_name: str, model_format: str, keep_alive: Optional[Union[int, str]] = None):
 		"""
 		Initialize the LlmModel.
 
 		Args:
 			model_name (str): The name of the language model to use.
 			model_format (str): The format for model output (e.g., "json").
+			keep_alive (int | str, optional): How long Ollama keeps the model loaded after a request
+				(e.g., "5m", or -1 to keep it loaded). Defaults to the Ollama server setting.
 		"""
 		self.model_name: str = model_name
 		self.model_format: str = model_format
-		self.model: ChatOllama = ChatOllama(model=model_name, temperature=0)
-		self.model_formatted: ChatOllama = ChatOllama(model=model_name, temperature=0, format=model_format)
+		self.keep_alive: Optional[Union[int, str]] = keep_alive
+		self.model: ChatOllama = ChatOllama(model=model_name, temperature=0, keep_alive=keep_alive)
+		self.model_formatted: ChatOllama = ChatOllama(model=model_name, temperature=0, format=model_format, keep_alive=keep_alive)
 
 	def get_model_name(self) -> str:
 		"""
@@ -69,6 +76,20 @@ class LlmModel:
 		"""
 		return self.model_formatted
 
+	def warm_up(self):
+		"""
+		Load the model into Ollama ahead of the first real request.
+
+		Ollama only loads the model weights on the first request it receives, so both
+		model instances are invoked once with a throwaway prompt limited to a single
+		token. This moves the model loading time to the application startup.
+		"""
+		try:
+			self.model.invoke([HumanMessage(content="ok")], options={"num_predict": 1})
+			self.model_formatted.invoke([HumanMessage(content='{"x":1}')], options={"num_predict": 1})
+		except Exception as e:
+			print(f"Error warming up the model {self.model_name}: {e}")
+
 	def __repr__(self) -> str:
 		"""
 		Get a string representation of the LlmModel.
@@ -7,6 +7,7 @@ Generation (RAG) and web search. It initializes the necessary components, builds
 the workflow graph, and handles user interaction.
 """
 
+import asyncio
 import os
 import sys
 
@@ -18,7 +19,7 @@ from src.vectorstore.document_processor import DocumentProcessor
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def main():
+async def main():
 	"""
 	Main function to run the CyberRAGLLM application.
 
@@ -28,7 +29,9 @@ def main():
 
 	The function handles user input, processes the question through the graph-based
 	workflow, and displays the results to the user. It continues processing questions
-	until the user terminates the application.
+	until the user terminates the application. Every question runs in the same event
+	loop, as the async clients of the language model keep connections bound to it, and
+	the user input is read in a worker thread so that it does not block the loop.
 	"""
 	print("Welcome to CyberRAGLLM!")
 	print("This application uses a graph-based workflow to answer questions using RAG and web search.")
@@ -38,15 +41,20 @@ def main():
 	document_processor = DocumentProcessor(urls=open("../rag_urls.txt").read().splitlines(), model="intfloat/multilingual-e5-large-instruct")
 	retriever = document_processor.get_retriever()
 
+	# Compile the graph of both web search settings once
+	graphs = {
+		web_search_enabled: ControlFlowState(llm_model, retriever, web_search_tool, web_search_enabled).build_graph()
+		for web_search_enabled in (True, False)
+	}
+
 	# Get user question
 	while True:
 		print("\n=== New Question ===")
-		web_search_enabled_input = input("Enable web search? (y/n): ")
+		web_search_enabled_input = await asyncio.to_thread(input, "Enable web search? (y/n): ")
 		web_search_enabled = web_search_enabled_input.lower() == "y"
-		control_flow_state = ControlFlowState(llm_model, retriever, web_search_tool, web_search_enabled)
-		graph = control_flow_state.build_graph()
-		question = input("Enter your question: ")
-		max_retries_input = input("Enter the maximum number of retries (default is 3): ")
+		graph = graphs[web_search_enabled]
+		question = await asyncio.to_thread(input, "Enter your question: ")
+		max_retries_input = await asyncio.to_thread(input, "Enter the maximum number of retries (default is 3): ")
 		if max_retries_input.strip() == "":
 			max_retries_input = 3
 		else:
@@ -60,16 +68,18 @@ def main():
 		state = {
 			"question": question,
 			"documents": [],
+			"docs_txt": "",
 			"web_search": "No",
 			"max_retries": max_retries_input,
 			"loop_step": 0,
 			"generation": "",
-			"answers": 0
+			"answers": 0,
+			"gave_up": False
 		}
 
 		# Run the graph
 		print("\nProcessing your question...")
-		result = graph.invoke(state)
+		result = await graph.ainvoke(state)
 
 		# Print the result
 		print("\n=== Result ===")
@@ -82,4 +92,4 @@ def main():
 			print(f"\nBased on {len(result['documents'])} documents")
 
 if __name__ == "__main__":
-	main()
+	asyncio.run(main())
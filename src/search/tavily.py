@@ -8,22 +8,39 @@ search tool.
 """
 
 import os
+import sys
 import getpass
 from langchain_community.tools.tavily_search import TavilySearchResults
 
+# Settings that do not depend on the user, set once when the module is imported
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+os.environ.setdefault("LANGCHAIN_PROJECT", "CyberRAGLLM")
 
-def _set_env(var: str):
+
+def _set_env(var: str, required: bool = True):
 	"""
 	Set an environment variable if it's not already set.
 
 	This function checks if an environment variable is set, and if not,
-	prompts the user to enter a value for it.
+	prompts the user to enter a value for it. The user is only prompted
+	from an interactive terminal, as a prompt would otherwise block forever
+	(e.g. when running as a service or from a worker thread).
 
 	Args:
 		var (str): The name of the environment variable to set.
+		required (bool, optional): Whether the variable is required when it cannot be prompted for.
+
+	Raises:
+		RuntimeError: If a required variable is not set and the user cannot be prompted for it.
 	"""
-	if not os.environ.get(var):
+	if os.environ.get(var):
+		return
+	if sys.stdin is not None and sys.stdin.isatty():
 		os.environ[var] = getpass.getpass(f"{var}: ")
+	elif required:
+		raise RuntimeError(f"The {var} environment variable is not set")
+	else:
+		print(f"The {var} environment variable is not set, skipping it")
 
 
 class TavilySearch:
@@ -40,12 +57,15 @@ class TavilySearch:
 		"""
 		Initialize the TavilySearch.
 
-		This method sets up the necessary environment variables and
+		This method sets up the necessary API keys and
 		creates a web search tool using the Tavily API and logs the process using Langsmith API.
+		Tracing to Langsmith is only enabled by default when its API key is set.
+
+		Raises:
+			RuntimeError: If the Tavily API key is not set and cannot be prompted for.
 		"""
 		_set_env("TAVILY_API_KEY")
-		os.environ["TOKENIZERS_PARALLELISM"] = "true"
-		_set_env("LANGSMITH_API_KEY")
-		os.environ["LANGCHAIN_TRACING_V2"] = "true"
-		os.environ["LANGCHAIN_PROJECT"] = "CyberRAGLLM"
+		_set_env("LANGSMITH_API_KEY", required=False)
+		if os.environ.get("LANGSMITH_API_KEY"):
+			os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
 		self.web_search_tool = TavilySearchResults(k=3)
@@ -8,11 +8,17 @@ and handling various edge cases like content stored in JavaScript variables.
 """
 
 from langchain_community.document_loaders import WebBaseLoader
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from typing import List, Dict, Any, Optional
 from langchain_core.documents import Document
-import requests
 import re
+from src.vectorstore.http_session import DEFAULT_HEADERS, SESSION
+
+# Tags whose text is not content of the page (meta tags are void, so they have no text)
+_SKIP_TAGS = frozenset({'script', 'style', 'noscript'})
+
+# Content stored in JSON-like structures of script tags
+_CONTENT_RE = re.compile(rb'"content"\s*:\s*"([^"]+)"')
 
 class CustomWebLoader(WebBaseLoader):
 	"""Custom web loader that extracts content from web pages more effectively."""
@@ -25,7 +31,8 @@ class CustomWebLoader(WebBaseLoader):
 			continue_on_failure: bool = False,
 			**kwargs: Any,
 	):
-		"""Initialize with web path."""
+		"""Initialize with web path, extra arguments (e.g. another session than the shared one) are passed to WebBaseLoader."""
+		kwargs.setdefault("session", SESSION)
 		super().__init__(
 			web_path=web_path,
 			header_template=header_template,
@@ -34,35 +41,32 @@ class CustomWebLoader(WebBaseLoader):
 			**kwargs,
 		)
 		# Store parameters locally
-		self.headers = header_template.copy() if header_template else {}
+		# The default headers are shared, they are only copied when the caller overrides some of them
+		self.headers = DEFAULT_HEADERS if not header_template else {**DEFAULT_HEADERS, **header_template}
 		self.verify = verify_ssl
 		self.continue_on_failure = continue_on_failure
 
-		# Add a user agent if not present
-		if "User-Agent" not in self.headers:
-			self.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+	def _scrape(self, url: str) -> bytes:
+		"""Scrape the content from the URL.
 
-	def _scrape(self, url: str) -> str:
-		"""Scrape the content from the URL."""
-		response = requests.get(url, headers=self.headers, verify=self.verify)
+		The body is returned as bytes, already decompressed by requests, and is decoded
+		only by the HTML parser, which detects the encoding of the page itself.
+		"""
+		response = self.session.get(url, headers=self.headers, verify=self.verify)
 		response.raise_for_status()
 
-		return response.text
-
-	def _extract_content(self, html: str) -> str:
-		"""Extract content from HTML, looking for large text blocks."""
-		soup = BeautifulSoup(html, "html.parser")
+		return response.content
 
-		# Get all text elements
-		all_text_elements = soup.find_all(string=True)
+	def _extract_content(self, tree: HTMLParser, html: bytes) -> str:
+		"""Extract content from a parsed HTML tree, looking for large text blocks.
 
-		# Filter out small text blocks, script tags, style tags, etc.
+		The non-content tags are removed from the tree and the remaining text nodes are
+		gathered by a single native traversal, instead of visiting every node in Python.
+		"""
+		# Filter out script tags, style tags, etc., then small text blocks
+		tree.strip_tags(list(_SKIP_TAGS), recursive=True)
 		content_blocks = []
-		for text in all_text_elements:
-			parent = text.parent.name if text.parent else None
-			if parent and parent.lower() in ['script', 'style', 'meta', 'noscript']:
-				continue
-
+		for text in tree.root.text(deep=True, separator="\x00").split("\x00"):
 			text_content = text.strip()
 			if len(text_content) > 100:  # Only include substantial text blocks
 				content_blocks.append(text_content)
@@ -71,51 +75,51 @@ class CustomWebLoader(WebBaseLoader):
 		if content_blocks:
 			return "\n\n".join(content_blocks)
 
-		# If no content blocks were found, try to extract from script tags
+		# If no content blocks were found, try to extract from the scripts of the page
 		# This is a fallback for sites that store content in JavaScript variables
-		script_tags = soup.find_all('script')
-		for script in script_tags:
-			script_content = script.string
-			if script_content:
-				# Look for content in JSON-like structures
-				content_matches = re.findall(r'"content"\s*:\s*"([^"]+)"', script_content)
-				if content_matches:
-					return "\n\n".join(content_matches)
+		content_matches = _CONTENT_RE.findall(html)
+		if content_matches:
+			return "\n\n".join(match.decode("utf-8", "ignore") for match in content_matches)
 
 		# If all else fails, return the title at least
-		title = soup.title.string if soup.title else ""
+		title_tag = tree.css_first("title")
+		title = title_tag.text() if title_tag else ""
 		return title
 
+	def _extract_metadata(self, tree: HTMLParser, url: str) -> Dict[str, str]:
+		"""Extract the title, description and language metadata from a parsed HTML tree."""
+		title_tag = tree.css_first("title")
+		title = title_tag.text() if title_tag else ""
+
+		# Get description from meta tags
+		description = ""
+		desc_tag = tree.css_first('meta[name="description"]')
+		if desc_tag and desc_tag.attributes.get("content"):
+			description = desc_tag.attributes["content"]
+
+		# Get language from html tag
+		language = "en"  # Default
+		html_tag = tree.css_first("html")
+		if html_tag and html_tag.attributes.get("lang"):
+			language = html_tag.attributes["lang"]
+
+		return {
+			"source": url,
+			"title": title,
+			"description": description,
+			"language": language,
+		}
+
 	def load(self) -> List[Document]:
 		"""Load data into document objects."""
 		docs = []
 		for url in self.web_paths:
 			try:
 				html = self._scrape(url)
-				content = self._extract_content(html)
-
-				# Extract metadata
-				soup = BeautifulSoup(html, "html.parser")
-				title = soup.title.string if soup.title else ""
-
-				# Get description from meta tags
-				description = ""
-				desc_tag = soup.find("meta", attrs={"name": "description"})
-				if desc_tag and "content" in desc_tag.attrs:
-					description = desc_tag["content"]
-
-				# Get language from html tag
-				language = "en"  # Default
-				html_tag = soup.find("html")
-				if html_tag and "lang" in html_tag.attrs:
-					language = html_tag["lang"]
-
-				metadata = {
-					"source": url,
-					"title": title,
-					"description": description,
-					"language": language,
-				}
+				# Parse the page once for both the content and the metadata
+				tree = HTMLParser(html)
+				content = self._extract_content(tree, html)
+				metadata = self._extract_metadata(tree, url)
 
 				docs.append(Document(page_content=content, metadata=metadata))
 			except Exception as e:
@@ -6,19 +6,82 @@ split them into chunks, embed those chunks using a language model, and create a
 efficient semantic retrieval.
 """
 
+import functools
+import hashlib
+import json
 import os
-import pathlib
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+import faiss
+import numpy as np
 import requests
+import tiktoken
+import torch
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import SKLearnVectorStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_huggingface import HuggingFaceEmbeddings
+from src.cache.cache_dir import get_cache_dir
+from src.cache.cached_embeddings import CachedEmbeddings
 from src.vectorstore.custom_web_loader import CustomWebLoader
+from src.vectorstore.http_session import SESSION
+from src.vectorstore.multi_gpu_embeddings import MultiGpuEmbeddings
+from src.vectorstore.onnx_embeddings import OnnxEmbeddings
 from src.vectorstore.pdf_loader import PDFLoader
 from src.vectorstore.text_loader import TextLoader
 
 
+# Extensions of the text-based files, loaded with the TextLoader
+TEXT_EXTENSIONS = frozenset({'.txt', '.md', '.markdown', '.rst', '.csv', '.json', '.xml', '.log', '.cfg', '.ini', '.properties'})
+
+# Environment variable forcing the persisted vector store to be rebuilt when set to "1"
+REBUILD_ENV_VAR = "CYBERRAGLLM_REBUILD_INDEX"
+
+# HNSW graph settings of the vector index: neighbors per node, and the sizes of the
+# candidate lists explored while building the graph and while searching it
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# Flags reading a persisted index with its vectors memory-mapped read-only, so that the processes
+# serving the same store (e.g. uvicorn workers) share its pages instead of each holding a copy.
+# Versions of faiss without IO_FLAG_MMAP_IFC only map inverted lists and read the HNSW index whole.
+INDEX_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+@functools.lru_cache(maxsize=4096)
+def _probe_pdf(url: str) -> bool:
+	"""
+	Check with a HEAD request if a URL serves a PDF file.
+
+	The result is cached per URL, so a URL is probed at most once per process. Failed
+	requests raise instead of returning, so that they are not cached and the URL is
+	probed again the next time.
+
+	Args:
+		url (str): The URL to check.
+
+	Returns:
+		bool: True if the URL serves a PDF file, False otherwise.
+
+	Raises:
+		requests.RequestException: If the request failed or timed out.
+	"""
+	headers = SESSION.head(url, allow_redirects=True, timeout=2).headers
+	content_type = headers.get('Content-Type', '').lower()
+	content_disp = headers.get('Content-Disposition', '').lower()
+	if 'application/pdf' in content_type:
+		return True
+	if '.pdf' in content_disp and 'filename' in content_disp:
+		return True
+	return False
+
+
 class DocumentProcessor:
 	"""
 	A class for processing web documents, PDF files, and text-based files into a vector store for retrieval.
@@ -29,7 +92,8 @@ class DocumentProcessor:
 	and creating a vector store for efficient semantic retrieval.
 
 	This class implements a caching mechanism to ensure documents are only loaded once
-	for the same set of URLs and parameters.
+	for the same set of URLs and parameters. Unless persistence is disabled, the embedded
+	vector store is also saved to disk and loaded back on the next runs.
 
 	Attributes:
 		urls (list): List of URLs or file paths to load content from.
@@ -38,11 +102,28 @@ class DocumentProcessor:
 		model (str): Name of the embedding model to use.
 		inference_mode (str): Mode for inference, either "local" or "remote".
 		k (int): Number of documents to retrieve.
+		precision (str): Precision of the embedding model, "float32", "bfloat16", "float16", "int8" or "auto".
+		persist_dir (str): Directory the vector store is persisted to, or None if persistence is disabled.
+		batch_size (int): Number of chunks encoded together by the embedding model.
+		backend (str): Runtime of the embedding model, "torch" or "onnx".
+		splitter (str): Strategy for splitting documents into chunks, "token" or "recursive".
+		multi_gpu (bool): Whether to spread the embedding of the chunks over every available GPU.
+		pdf_format (str): Format PDF content is extracted as, "text" or "markdown".
 		retriever (VectorStoreRetriever): The retriever for getting documents.
 	"""
 	# Class-level cache to store retrievers for specific configurations
 	_cache = {}
-	def __init__(self, urls: list=None, chunk_size: int=1000, chunk_overlap: int=200, model: str="intfloat/multilingual-e5-large-instruct", inference_mode: str="local", k: int=3):
+	# Class-level cache to share embedding models between configurations using the same model
+	_embeddings_cache = {}
+	# Supported precisions of the embedding model
+	_precisions = ("float32", "bfloat16", "float16", "int8", "auto")
+	# Supported runtimes of the embedding model
+	_backends = ("torch", "onnx")
+	# Supported strategies for splitting documents into chunks
+	_splitters = ("token", "recursive")
+	# Supported formats of the extracted PDF content
+	_pdf_formats = ("text", "markdown")
+	def __init__(self, urls: list=None, chunk_size: int=1000, chunk_overlap: int=200, model: str="intfloat/multilingual-e5-large-instruct", inference_mode: str="local", k: int=3, precision: str="float32", persist_dir: str=None, batch_size: int=64, backend: str="torch", persist: bool=True, splitter: str="token", multi_gpu: bool=True, pdf_format: str="text", rebuild: bool=False):
 		"""
 		Initialize the DocumentProcessor.
 
@@ -53,39 +134,189 @@ class DocumentProcessor:
 			model (str, optional): Name of the embedding model to use.
 			inference_mode (str, optional): Mode for inference, either "local" or "remote".
 			k (int, optional): Number of documents to retrieve.
+			precision (str, optional): Precision of the embedding model. "auto" uses bfloat16 on GPU
+				(float16 on GPUs without bfloat16 support) and dynamic INT8 quantization on CPU.
+			persist_dir (str, optional): Directory to persist the vector store to, the vs directory of the
+				application cache by default. The vector store is keyed by the list of sources and the splitting
+				and embedding settings, not by the content of the sources, so changes of the source documents
+				are only picked up when it is rebuilt.
+			batch_size (int, optional): Number of chunks encoded together by the embedding model.
+				Larger batches keep a GPU busier at the cost of more memory.
+			backend (str, optional): Runtime of the embedding model. "onnx" exports the model to ONNX
+				once and runs it on ONNX Runtime, it requires optimum[onnxruntime] and ignores the precision.
+			persist (bool, optional): Whether to persist the vector store to disk.
+			splitter (str, optional): Strategy for splitting documents into chunks. "token" cuts windows
+				of chunk_size tokens every chunk_size - chunk_overlap tokens, "recursive" cuts along
+				paragraphs, lines and words with RecursiveCharacterTextSplitter, which is slower.
+			multi_gpu (bool, optional): Whether to spread the embedding of the chunks over every available
+				GPU, with one replica of the model per GPU. It only applies to the torch backend.
+			pdf_format (str, optional): Format PDF content is extracted as. "text" is the fastest, "markdown"
+				keeps headings and tables for structure-aware downstream tasks.
+			rebuild (bool, optional): Whether to rebuild the persisted vector store from the sources even if
+				it exists, e.g. after the source documents changed. Also enabled by setting the
+				CYBERRAGLLM_REBUILD_INDEX environment variable to "1".
+
+		Raises:
+			ValueError: If the precision, the backend, the splitter or the PDF format is not supported,
+				or if the chunk overlap is not smaller than the chunk size.
 		"""
+		if precision not in self._precisions:
+			raise ValueError(f"Unsupported embedding precision: {precision}, expected one of {self._precisions}")
+		if backend not in self._backends:
+			raise ValueError(f"Unsupported embedding backend: {backend}, expected one of {self._backends}")
+		if splitter not in self._splitters:
+			raise ValueError(f"Unsupported splitter: {splitter}, expected one of {self._splitters}")
+		if pdf_format not in self._pdf_formats:
+			raise ValueError(f"Unsupported PDF format: {pdf_format}, expected one of {self._pdf_formats}")
+		if chunk_overlap >= chunk_size:
+			raise ValueError(f"The chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})")
 		self.urls = urls if urls is not None else []
 		self.chunk_size = chunk_size
 		self.chunk_overlap = chunk_overlap
 		self.model = model
 		self.inference_mode = inference_mode
 		self.k = k
+		self.precision = precision
+		if not persist:
+			self.persist_dir = None
+		else:
+			self.persist_dir = persist_dir if persist_dir is not None else get_cache_dir("vs")
+		self.batch_size = batch_size
+		self.backend = backend
+		self.splitter = splitter
+		self.multi_gpu = multi_gpu
+		self.pdf_format = pdf_format
+		self.rebuild = rebuild or os.environ.get(REBUILD_ENV_VAR) == "1"
+		# Shared by the loaders so that connections to the same hosts are reused
+		self._session = SESSION
 
 		cache_key = self._generate_cache_key()
-		if cache_key in DocumentProcessor._cache:
+		if cache_key in DocumentProcessor._cache and not self.rebuild:
 			print("Using cached document retriever - skipping document loading")
 			self.retriever = DocumentProcessor._cache[cache_key]
 		else:
 			self.retriever = self._process()
 			DocumentProcessor._cache[cache_key] = self.retriever
 
-	def _generate_cache_key(self):
+	def _generate_cache_key(self) -> str:
 		"""
 		Generate a unique cache key based on the current configuration.
 
+		The key is a digest of a canonical JSON encoding of the configuration, so that it
+		is stable across processes, unlike the hash of a tuple, which is salted per process.
+
 		Returns:
-			str: A hash string that uniquely identifies the current configuration.
+			str: A SHA-256 hex digest that uniquely identifies the current configuration.
 		"""
-		sorted_urls = sorted(self.urls) if self.urls else []
-		config = (
-			tuple(sorted_urls),
-			self.chunk_size,
-			self.chunk_overlap,
-			self.model,
-			self.inference_mode,
-			self.k
-		)
-		return str(hash(config))
+		config = {
+			"index": self._generate_index_key(),
+			"inference_mode": self.inference_mode,
+			"k": self.k
+		}
+		return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+	def _generate_index_key(self) -> str:
+		"""
+		Generate a key identifying the persisted vector store of the current configuration.
+
+		It covers every setting that changes the stored chunks or their embeddings, but not
+		the number of documents to retrieve, which only changes the retriever. The precision
+		is the one resolved on this host, along with the device, so that e.g. a store embedded
+		in bfloat16 on a GPU is not queried with INT8 embeddings on a CPU host.
+
+		Returns:
+			str: A SHA-256 hex digest of the sources and the splitting and embedding settings.
+		"""
+		precision, device = self._resolve_precision()
+		config = {
+			"urls": sorted(url.strip() for url in self.urls),
+			"chunk_size": self.chunk_size,
+			"chunk_overlap": self.chunk_overlap,
+			"model": self.model,
+			"precision": precision,
+			"device": device,
+			"backend": self.backend,
+			"splitter": self.splitter,
+			"pdf_format": self.pdf_format
+		}
+		return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+	def _resolve_precision(self) -> tuple[str, str]:
+		"""
+		Resolve the precision and the device the embedding model runs at on this host.
+
+		"auto" uses bfloat16 on GPU (float16 on GPUs without bfloat16 support) and INT8 on CPU.
+		Dynamically quantized modules only run on CPU. The ONNX backend ignores the precision.
+
+		Returns:
+			tuple[str, str]: The precision and the device, "cuda" or "cpu".
+		"""
+		use_cuda = torch.cuda.is_available()
+		if self.backend == "onnx":
+			return "onnx", "cuda" if use_cuda else "cpu"
+		precision = self.precision
+		if precision == "auto":
+			if not use_cuda:
+				precision = "int8"
+			else:
+				precision = "bfloat16" if torch.cuda.is_bf16_supported() else "float16"
+		device = "cuda" if use_cuda and precision != "int8" else "cpu"
+		return precision, device
+
+	def _build_embeddings(self) -> Embeddings:
+		"""
+		Build the embedding model on the configured backend and at the configured precision.
+
+		Half precision halves the memory traffic of the encoder on GPU, while dynamic
+		INT8 quantization of its linear layers lets the CPU use integer dot product
+		instructions (e.g. AVX-512 VNNI). On CPU, torch is allowed to use every core,
+		since some environments default it to a single thread. The chunks are encoded
+		in batches of the configured size, which sentence-transformers sorts by length
+		to limit padding. With several GPUs, the chunks are split between replicas of
+		the model on every GPU.
+
+		Returns:
+			Embeddings: The embedding model.
+		"""
+		precision, device = self._resolve_precision()
+		if self.backend == "onnx":
+			return OnnxEmbeddings(self.model, batch_size=self.batch_size, use_cuda=device == "cuda")
+
+		if device == "cpu":
+			torch.set_num_threads(os.cpu_count() or 1)
+
+		model_kwargs = {"device": device}
+		if precision in ("bfloat16", "float16"):
+			model_kwargs["model_kwargs"] = {"torch_dtype": getattr(torch, precision)}
+		encode_kwargs = {"batch_size": self.batch_size, "normalize_embeddings": True}
+		gpu_count = torch.cuda.device_count() if device == "cuda" and self.multi_gpu else 1
+		if gpu_count > 1:
+			return MultiGpuEmbeddings([
+				HuggingFaceEmbeddings(model_name=self.model, model_kwargs={**model_kwargs, "device": f"cuda:{gpu}"}, encode_kwargs=encode_kwargs)
+				for gpu in range(gpu_count)
+			])
+		embeddings = HuggingFaceEmbeddings(model_name=self.model, model_kwargs=model_kwargs, encode_kwargs=encode_kwargs)
+
+		if precision == "int8":
+			torch.ao.quantization.quantize_dynamic(embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+		return embeddings
+
+	def _get_embeddings_model(self) -> CachedEmbeddings:
+		"""
+		Get the embedding model of the current configuration, building it only once per process.
+
+		The model weights are shared by every DocumentProcessor using the same model, backend,
+		precision, batch size and GPU setting, e.g. for different sets of URLs.
+
+		Returns:
+			CachedEmbeddings: The embedding model, wrapped with a query embedding cache.
+		"""
+		key = (self.model, self.backend, self.precision, self.batch_size, self.multi_gpu)
+		embeddings = DocumentProcessor._embeddings_cache.get(key)
+		if embeddings is None:
+			embeddings = CachedEmbeddings(self._build_embeddings())
+			DocumentProcessor._embeddings_cache[key] = embeddings
+		return embeddings
 
 	def _is_pdf(self, path: str) -> bool:
 		"""
@@ -100,19 +331,15 @@ class DocumentProcessor:
 		# Check if the path ends with .pdf (case insensitive)
 		if path.lower().strip('"').endswith('.pdf'):
 			return True
-		if path.startswith('http://') or path.startswith('https://'):
+		if path.startswith(('http://', 'https://')):
 			if '?type=pdf' in path.lower() or '&type=pdf' in path.lower():
 				return True
-			try:
-				headers = requests.head(path, allow_redirects=True).headers
-				content_type = headers.get('Content-Type', '').lower()
-				content_disp = headers.get('Content-Disposition', '').lower()
-				if 'application/pdf' in content_type:
-					return True
-				if '.pdf' in content_disp and 'filename' in content_disp:
-					return True
-			except:
-				pass
+			# Only probe the server when the extension does not already tell the file type
+			if not self._is_text_file(path):
+				try:
+					return _probe_pdf(path)
+				except requests.RequestException as e:
+					print(f"Could not probe the file type of {path}, loading it as a web page: {e}")
 		return False
 
 	def _is_text_file(self, path: str) -> bool:
@@ -125,15 +352,200 @@ class DocumentProcessor:
 		Returns:
 			bool: True if the path points to a text-based file, False otherwise.
 		"""
-		# List of common text file extensions
-		text_extensions = ['.txt', '.md', '.markdown', '.rst', '.csv', '.json', '.xml', '.log', '.cfg', '.ini', '.properties']
-
 		# Check if the path ends with a text file extension (case insensitive)
-		path_lower = path.lower().strip('"')
-		for ext in text_extensions:
-			if path_lower.endswith(ext):
-				return True
-		return False
+		return os.path.splitext(path.lower().strip('"'))[1] in TEXT_EXTENSIONS
+
+	def _classify(self, path: str) -> str:
+		"""
+		Classify a URL or file path by the loader it needs.
+
+		Args:
+			path (str): The URL or file path to classify.
+
+		Returns:
+			str: "pdf" for PDF files, "text" for text-based files, and "web" for anything else.
+		"""
+		if self._is_pdf(path):
+			return "pdf"
+		elif self._is_text_file(path):
+			return "text"
+		return "web"
+
+	def _expand_paths(self) -> list:
+		"""
+		Expand the directories among the URLs and file paths into the files they contain.
+
+		The files of a directory are classified while listing it to skip unsupported files,
+		the other URLs and file paths are left to be classified by the loading threads.
+
+		Returns:
+			list: The (path, kind) pairs to load, where each directory is replaced by its PDF
+			and text-based files, and kind is None when the path is not classified yet.
+		"""
+		paths = []
+		for url in self.urls:
+			url = url.strip()
+			if os.path.isdir(url):
+				print(f"Loading Directory: {url}")
+				with os.scandir(url) as entries:
+					for entry in entries:
+						if not entry.is_file():
+							continue
+						kind = self._classify(entry.path)
+						if kind != "web":
+							paths.append((entry.path, kind))
+						else:
+							print(f"Skipping unsupported file type: {entry.path}")
+			else:
+				paths.append((url, None))
+		return paths
+
+	def _load_one(self, path: str, kind: str | None, index: int, total: int) -> list:
+		"""
+		Load a URL or file path with the loader matching its type.
+
+		Args:
+			path (str): The URL or file path to load.
+			kind (str | None): The kind of the path as returned by _classify, or None to classify it.
+			index (int): The position of the path among the paths to load, for progress reporting.
+			total (int): The number of paths to load, for progress reporting.
+
+		Returns:
+			list: The documents loaded from the path.
+		"""
+		if kind is None:
+			kind = self._classify(path)
+		if kind == "pdf":
+			# Use PDFLoader for PDF files
+			print(f"Loading PDF: {path} ({index+1}/{total})")
+			return PDFLoader(path, session=self._session, pdf_format=self.pdf_format).load()
+		elif kind == "text":
+			# Use TextLoader for text-based files
+			print(f"Loading text file: {path} ({index+1}/{total})")
+			return TextLoader(path, session=self._session).load()
+		else:
+			# Use CustomWebLoader for web content
+			print(f"Loading web content: {path} ({index+1}/{total})")
+			return CustomWebLoader(path, session=self._session).load()
+
+	def _split_documents(self, docs_list: list[Document]) -> list[Document]:
+		"""
+		Split documents into chunks of at most chunk_size tokens.
+
+		With the "token" splitter, every document is encoded once, in a single batch encoded
+		by tiktoken's native threads, and the chunks are windows of the token lists, so no
+		text is encoded again while looking for split points.
+
+		Args:
+			docs_list (list[Document]): The documents to split.
+
+		Returns:
+			list[Document]: The chunks, carrying the metadata of their document.
+		"""
+		if self.splitter == "recursive":
+			text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+				chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+			)
+			return text_splitter.split_documents(docs_list)
+
+		encoding = tiktoken.get_encoding("cl100k_base")
+		num_threads = os.cpu_count() or 1
+		token_lists = encoding.encode_batch([doc.page_content for doc in docs_list], num_threads=num_threads, disallowed_special=())
+
+		stride = self.chunk_size - self.chunk_overlap
+		windows = []
+		window_docs = []
+		for doc, tokens in zip(docs_list, token_lists):
+			# The last window starts before the overlap of the end, so no window is contained in the previous one
+			for start in range(0, max(len(tokens) - self.chunk_overlap, 1), stride):
+				windows.append(tokens[start:start + self.chunk_size])
+				window_docs.append(doc)
+
+		doc_splits = []
+		for doc, text in zip(window_docs, encoding.decode_batch(windows, num_threads=num_threads)):
+			if text.strip():
+				doc_splits.append(Document(page_content=text, metadata=dict(doc.metadata)))
+		return doc_splits
+
+	def _build_vectorstore(self, doc_splits: list[Document]) -> FAISS:
+		"""
+		Embed the chunks and index them in an HNSW graph.
+
+		The embeddings are normalized, so the inner product of the index is the cosine
+		similarity, and a search visits a number of chunks growing logarithmically with
+		the size of the corpus instead of comparing the query with every chunk.
+
+		Args:
+			doc_splits (list[Document]): The chunks to index.
+
+		Returns:
+			FAISS: The vector store of the chunks.
+		"""
+		embeddings = self._get_embeddings_model()
+		texts = [doc.page_content for doc in doc_splits]
+		vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+		index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+		index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+		index.hnsw.efSearch = HNSW_EF_SEARCH
+		vectorstore = FAISS(
+			embedding_function=embeddings,
+			index=index,
+			docstore=InMemoryDocstore(),
+			index_to_docstore_id={},
+			distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+		)
+		vectorstore.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in doc_splits])
+		return vectorstore
+
+	def _save_vectorstore(self, vectorstore: FAISS, index_name: str):
+		"""
+		Persist a vector store to the persist directory.
+
+		The index and the docstore are written to a temporary directory and then moved in
+		place, the index last as it is the file checked first when loading, so that a
+		process stopped while saving never leaves a store that only half exists.
+
+		Args:
+			vectorstore (FAISS): The vector store to persist.
+			index_name (str): The name of the persisted files.
+		"""
+		os.makedirs(self.persist_dir, exist_ok=True)
+		temp_dir = tempfile.mkdtemp(dir=self.persist_dir, suffix=".tmp")
+		try:
+			vectorstore.save_local(temp_dir, index_name=index_name)
+			for extension in (".pkl", ".faiss"):
+				os.replace(os.path.join(temp_dir, index_name + extension), os.path.join(self.persist_dir, index_name + extension))
+		finally:
+			shutil.rmtree(temp_dir, ignore_errors=True)
+		print(f"Persisted vector store: {os.path.join(self.persist_dir, index_name)}.faiss")
+
+	def _load_vectorstore(self, index_path: str, docstore_path: str) -> FAISS:
+		"""
+		Load a persisted vector store, with its index memory-mapped read-only.
+
+		The files saved by save_local are read here instead of through load_local, which
+		reads the whole index into the memory of every process. A rebuilt store replaces
+		the files instead of writing over them, so a mapped index stays valid.
+
+		Args:
+			index_path (str): The path of the FAISS index.
+			docstore_path (str): The path of the pickled docstore and ids of the index.
+
+		Returns:
+			FAISS: The vector store.
+		"""
+		index = faiss.read_index(index_path, INDEX_MMAP_FLAGS)
+		# The pickled docstore was written by this class, not taken from an untrusted source
+		with open(docstore_path, "rb") as file:
+			docstore, index_to_docstore_id = pickle.load(file)
+		return FAISS(
+			embedding_function=self._get_embeddings_model(),
+			index=index,
+			docstore=docstore,
+			index_to_docstore_id=index_to_docstore_id,
+			distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+		)
 
 	def _process(self) -> VectorStoreRetriever | None:
 		"""
@@ -142,44 +554,36 @@ class DocumentProcessor:
 		This method loads documents from the URLs and file paths, splits them into chunks,
 		embeds the chunks using the specified model, and creates a vector store
 		for efficient retrieval. It automatically detects PDF files, text-based files,
-		and web content, and uses the appropriate loader for each.
+		and web content, and uses the appropriate loader for each. The sources are
+		loaded concurrently since loading them is mostly waiting on the network.
 
 		Returns:
 			VectorStoreRetriever: A retriever for getting documents from the vector store.
 		"""
-		# Load documents using appropriate loaders based on the file type
-		docs = []
-		urls_len = len(self.urls)
-		file_offset = 0
-		for index, url in enumerate(self.urls):
-			url = url.strip()
-			if os.path.isdir(url):
-				print(f"Loading Directory: {url} ({index+file_offset+1}/{urls_len})")
-				files_in_dir = pathlib.Path(url).glob("*")
-				urls_len += len(list(files_in_dir))
-				for file in pathlib.Path(url).glob("*"):
-					file_offset += 1
-					file_str = file.__str__()
-					if self._is_pdf(file_str):
-						print(f"Loading PDF: {file_str} ({index+file_offset+1}/{urls_len})")
-						docs.append(PDFLoader(file_str).load())
-					elif self._is_text_file(file_str):
-						print(f"Loading text file: {file_str} ({index+file_offset+1}/{urls_len})")
-						docs.append(TextLoader(file_str).load())
-					else:
-						print(f"Skipping unsupported file type: {file_str}")
-			elif self._is_pdf(url):
-				# Use PDFLoader for PDF files
-				print(f"Loading PDF: {url} ({index+file_offset+1}/{urls_len})")
-				docs.append(PDFLoader(url).load())
-			elif self._is_text_file(url):
-				# Use TextLoader for text-based files
-				print(f"Loading text file: {url} ({index+file_offset+1}/{urls_len})")
-				docs.append(TextLoader(url).load())
-			else:
-				# Use CustomWebLoader for web content
-				print(f"Loading web content: {url} ({index+file_offset+1}/{urls_len})")
-				docs.append(CustomWebLoader(url).load())
+		# Load the persisted vector store if it was already built for this configuration
+		index_name = self._generate_index_key()
+		if self.persist_dir is not None and not self.rebuild:
+			persist_path = os.path.join(self.persist_dir, f"{index_name}.faiss")
+			docstore_path = os.path.join(self.persist_dir, f"{index_name}.pkl")
+			# Both the index and the docstore are needed, a store missing either is rebuilt
+			if os.path.isfile(persist_path) and os.path.isfile(docstore_path):
+				print(f"Loading persisted vector store: {persist_path}")
+				vectorstore = self._load_vectorstore(persist_path, docstore_path)
+				self.retriever = vectorstore.as_retriever(search_kwargs={"k": self.k})
+				return self.retriever
+
+		# Fork the PDF extraction processes before any loading thread starts, plain text is
+		# extracted by pdftotext instead when it is installed
+		if self.pdf_format == "markdown" or PDFLoader._pdftotext is None:
+			PDFLoader.start_pool()
+		try:
+			# Load documents concurrently, using appropriate loaders based on the file type
+			paths = self._expand_paths()
+			with ThreadPoolExecutor(max_workers=min(32, max(1, len(paths)))) as executor:
+				futures = [executor.submit(self._load_one, path, kind, index, len(paths)) for index, (path, kind) in enumerate(paths)]
+				docs = [future.result() for future in futures]
+		finally:
+			PDFLoader.shutdown_pool()
 
 		# Flatten the list of documents
 		docs_list = [item for sublist in docs for item in sublist]
@@ -190,19 +594,19 @@ class DocumentProcessor:
 			return None
 
 		# Split documents
-		text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-			chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
-		)
-		doc_splits = text_splitter.split_documents(docs_list)
+		doc_splits = self._split_documents(docs_list)
+
+		if not doc_splits:
+			print("Warning: The loaded documents have no content.")
+			return None
 
 		# Add to vectorDB
-		vectorstore = SKLearnVectorStore.from_documents(
-			documents=doc_splits,
-			embedding=HuggingFaceEmbeddings(model_name=self.model)
-		)
+		vectorstore = self._build_vectorstore(doc_splits)
+		if self.persist_dir is not None:
+			self._save_vectorstore(vectorstore, index_name)
 
 		# Create retriever
-		self.retriever = vectorstore.as_retriever(k=self.k)
+		self.retriever = vectorstore.as_retriever(search_kwargs={"k": self.k})
 		return self.retriever
 
 	def get_retriever(self) -> VectorStoreRetriever:
@@ -215,6 +619,18 @@ class DocumentProcessor:
 		"""
 		return self.retriever
 
+	def get_embeddings(self) -> Embeddings | None:
+		"""
+		Get the embedding model backing the vector store.
+
+		Returns:
+			Embeddings: The embedding model used to embed the documents and the queries, which
+			caches the query embeddings, or None if no documents were loaded.
+		"""
+		if self.retriever is None:
+			return None
+		return self.retriever.vectorstore.embeddings
+
 
 if __name__ == "__main__":
 	urls_to_check = [
@@ -0,0 +1,134 @@
+"""
+Module for the base class of the file loaders of the CyberRAGLLM application.
+
+This module provides the parts shared by the PDF and text file loaders: the
+handling of the request settings, the detection of URLs, the conditional
+downloads of URLs already loaded by a previous run, the error handling of the
+continue_on_failure setting, and the concurrent loading of several files.
+"""
+
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import requests
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+from src.cache.extraction_cache import ExtractionCache
+from src.cache.validator_cache import ValidatorCache
+from src.vectorstore.http_session import DEFAULT_HEADERS, SESSION
+
+class FileLoader(BaseLoader):
+	"""Base class of the loaders of local and internet files.
+
+	Subclasses implement _lazy_load_documents, which yields the documents of the
+	file, and inherit the loading methods of the LangChain document loaders built
+	on lazy_load.
+	"""
+	# Kind of the loaded files, used in error messages
+	file_kind = "file"
+	# Name of the on-disk cache of the content extracted from the loaded files
+	cache_name = "files"
+	# Class-level caches of the extracted content of every cache name, and of the validators
+	# of the downloaded URLs, shared with the next runs
+	_extraction_caches = {}
+	_validator_cache = None
+
+	def __init__(self, file_path: str, header_template: Optional[Dict[str, str]] = None, verify_ssl: bool = True, continue_on_failure: bool = False, session: Optional[requests.Session] = None):
+		"""Initialize with file path or URL, and optionally a session other than the shared one."""
+		self.file_path = file_path
+		# The default headers are shared, they are only copied when the caller overrides some of them
+		self.headers = DEFAULT_HEADERS if not header_template else {**DEFAULT_HEADERS, **header_template}
+		self.verify = verify_ssl
+		self.continue_on_failure = continue_on_failure
+		self.session = session if session is not None else SESSION
+
+	def _is_url(self, path: str) -> bool:
+		"""Check if the path is a URL."""
+		return path.startswith(("http://", "https://"))
+
+	def _get_extraction_cache(self) -> ExtractionCache:
+		"""Get the cache of the content extracted by this loader, creating it on first use."""
+		cache = FileLoader._extraction_caches.get(self.cache_name)
+		if cache is None:
+			cache = FileLoader._extraction_caches[self.cache_name] = ExtractionCache(self.cache_name)
+		return cache
+
+	def _get_validator_cache(self) -> ValidatorCache:
+		"""Get the cache of the validators of the downloaded URLs, creating it on first use."""
+		if FileLoader._validator_cache is None:
+			FileLoader._validator_cache = ValidatorCache("http")
+		return FileLoader._validator_cache
+
+	def _revalidation(self, url: str, *variants: str) -> Tuple[Dict[str, str], Optional[str]]:
+		"""Get the headers of the download of a URL and the content extracted from its last download.
+
+		The download is only made conditional when the content extracted from the last
+		download is still cached with one of the variants, tried in order, so that a
+		304 Not Modified response can always be served from it.
+
+		Returns:
+			Tuple[Dict[str, str], Optional[str]]: The request headers, and the cached content
+			or None if the download is not conditional.
+		"""
+		entry = self._get_validator_cache().get(url)
+		if entry is not None and "digest" in entry:
+			for variant in variants:
+				content = self._get_extraction_cache().get(entry["digest"], variant)
+				if content is not None:
+					return {**self.headers, **ValidatorCache.conditional_headers(entry)}, content
+		return self.headers, None
+
+	def _remember_validators(self, url: str, digest: str, response: requests.Response):
+		"""Store the validators of the download of a URL, for the next downloads to be conditional."""
+		self._get_validator_cache().put(url, digest, response)
+
+	def _forget_validators(self, url: str):
+		"""Remove the validators of a URL, for its next download not to be conditional."""
+		self._get_validator_cache().delete(url)
+
+	def _check_modified(self, url: str, response: requests.Response):
+		"""Check that the response of a download that was not conditional holds the content.
+
+		Raises:
+			requests.HTTPError: If the server answered with 304 Not Modified anyway.
+		"""
+		if response.status_code == 304:
+			raise requests.HTTPError(f"{url} answered 304 Not Modified to a request that was not conditional", response=response)
+
+	@abstractmethod
+	def _lazy_load_documents(self) -> Iterator[Document]:
+		"""Yield the documents of the file."""
+
+	def lazy_load(self) -> Iterator[Document]:
+		"""Lazily load the file into document objects.
+
+		Errors are reported and end the loading when continue_on_failure is set,
+		and are raised otherwise.
+		"""
+		try:
+			yield from self._lazy_load_documents()
+		except Exception as e:
+			if self.continue_on_failure:
+				print(f"Error processing {self.file_kind} {self.file_path}: {e}")
+			else:
+				raise e
+
+	@classmethod
+	def load_many(cls, file_paths: List[str], max_workers: int = 5, **kwargs) -> List[Document]:
+		"""Load several files concurrently into document objects.
+
+		The downloads and reads overlap in a pool of threads, which also run the
+		extraction as it mostly waits on I/O or runs in native code. The number of
+		threads bounds the concurrent requests sent to the servers.
+
+		Args:
+			file_paths (List[str]): The file paths or URLs to load.
+			max_workers (int, optional): Maximum number of files loaded at the same time.
+			**kwargs: The arguments passed to the loader of every file.
+
+		Returns:
+			List[Document]: The documents of the files, in the order of the file paths.
+		"""
+		with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_paths)))) as executor:
+			docs = executor.map(lambda file_path: cls(file_path, **kwargs).load(), file_paths)
+			return [doc for file_docs in docs for doc in file_docs]
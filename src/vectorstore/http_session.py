@@ -0,0 +1,42 @@
+"""
+Module for the HTTP session shared by the loaders of the CyberRAGLLM application.
+
+This module provides a single requests session whose connection pools are reused by
+every loader and probe, so that sources served by the same host do not each pay for
+a new TCP and TLS handshake.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+# Number of hosts with pooled connections, and of pooled connections per host, sized
+# above the number of loading threads so that concurrent loads do not discard connections
+POOL_SIZE = 50
+# Number of retries of failed connections
+MAX_RETRIES = 3
+# Headers sent by the loaders, with a browser user agent as some sites reject unknown clients,
+# and every compression urllib3 can decode, which includes brotli when the brotli package is
+# installed, so that text and HTML sources are downloaded compressed. Shared by every loader,
+# so it must not be modified.
+DEFAULT_HEADERS = {
+	"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+	"Accept-Encoding": DEFAULT_ACCEPT_ENCODING
+}
+
+
+def _create_session() -> requests.Session:
+	"""
+	Create an HTTP session with connection pools sized for concurrent loading.
+
+	Returns:
+		requests.Session: The session.
+	"""
+	session = requests.Session()
+	adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=MAX_RETRIES)
+	session.mount("https://", adapter)
+	session.mount("http://", adapter)
+	return session
+
+
+SESSION = _create_session()
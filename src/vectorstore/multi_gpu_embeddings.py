@@ -0,0 +1,69 @@
+"""
+Module for spreading the embedding of documents over several GPUs in the CyberRAGLLM application.
+
+This module provides a LangChain embedding model that holds one replica of an embedding
+model per GPU and splits the documents to embed between them. The replicas run in threads
+of the current process, as torch releases the GIL while the GPUs compute.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class MultiGpuEmbeddings(Embeddings):
+	"""
+	An embedding model running replicas of an embedding model on several GPUs.
+
+	The documents are sorted by length and dealt to the replicas in turn, so that every
+	replica gets mini-batches of comparable shapes and a comparable amount of work.
+	Queries are embedded by the first replica only, as a single query cannot be split.
+
+	Attributes:
+		replicas (List[Embeddings]): The replicas of the embedding model, one per GPU.
+	"""
+	def __init__(self, replicas: List[Embeddings]):
+		"""
+		Initialize the MultiGpuEmbeddings.
+
+		Args:
+			replicas (List[Embeddings]): The replicas of the embedding model, one per GPU.
+		"""
+		self.replicas = replicas
+		self._executor = ThreadPoolExecutor(max_workers=len(replicas))
+
+	def embed_documents(self, texts: List[str]) -> List[List[float]]:
+		"""
+		Embed documents, splitting them between the replicas.
+
+		Args:
+			texts (List[str]): The documents to embed.
+
+		Returns:
+			List[List[float]]: The embeddings of the documents, in the order of the documents.
+		"""
+		order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+		shards = [order[start::len(self.replicas)] for start in range(len(self.replicas))]
+		futures = [
+			self._executor.submit(replica.embed_documents, [texts[i] for i in shard])
+			for replica, shard in zip(self.replicas, shards) if shard
+		]
+
+		embeddings = [None] * len(texts)
+		for shard, future in zip(shards, futures):
+			for i, embedding in zip(shard, future.result()):
+				embeddings[i] = embedding
+		return embeddings
+
+	def embed_query(self, text: str) -> List[float]:
+		"""
+		Embed a query with the first replica.
+
+		Args:
+			text (str): The query to embed.
+
+		Returns:
+			List[float]: The embedding of the query.
+		"""
+		return self.replicas[0].embed_query(text)
@@ -0,0 +1,113 @@
+"""
+Module for running the embedding model on ONNX Runtime in the CyberRAGLLM application.
+
+This module provides a LangChain embedding model that exports a Hugging Face encoder
+to ONNX once, caches the exported model on disk, and runs it with ONNX Runtime instead
+of the PyTorch eager graph. It requires the optional optimum[onnxruntime] dependency.
+"""
+
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.cache.cache_dir import get_cache_dir
+
+
+class OnnxEmbeddings(Embeddings):
+	"""
+	An embedding model running a Hugging Face encoder on ONNX Runtime.
+
+	The embeddings are the mean of the token states over the attention mask, normalized
+	to unit length, like the sentence-transformers pooling of the E5 models. Texts are
+	sorted by length before being batched so that each batch is padded only to the
+	length of its longest text.
+
+	Attributes:
+		model_name (str): Name of the Hugging Face model.
+		batch_size (int): Number of texts encoded together.
+		max_length (int): Maximum number of tokens of an encoded text.
+	"""
+	def __init__(self, model_name: str, batch_size: int = 64, max_length: int = 512, use_cuda: bool = False):
+		"""
+		Initialize the OnnxEmbeddings, exporting the model to ONNX on first use.
+
+		Args:
+			model_name (str): Name of the Hugging Face model.
+			batch_size (int, optional): Number of texts encoded together.
+			max_length (int, optional): Maximum number of tokens of an encoded text.
+			use_cuda (bool, optional): Whether to run the model with the CUDA execution provider.
+
+		Raises:
+			ImportError: If optimum[onnxruntime] is not installed.
+		"""
+		try:
+			from optimum.onnxruntime import ORTModelForFeatureExtraction
+			from transformers import AutoTokenizer
+		except ImportError as e:
+			raise ImportError("The ONNX embedding backend requires optimum[onnxruntime], install it with `pip install optimum[onnxruntime]`") from e
+
+		self.model_name = model_name
+		self.batch_size = batch_size
+		self.max_length = max_length
+		provider = "CUDAExecutionProvider" if use_cuda else "CPUExecutionProvider"
+
+		export_dir = get_cache_dir("onnx", model_name.replace("/", "--"))
+		try:
+			self._model = ORTModelForFeatureExtraction.from_pretrained(export_dir, provider=provider)
+			self._tokenizer = AutoTokenizer.from_pretrained(export_dir)
+		except (OSError, ValueError):
+			print(f"Exporting embedding model to ONNX: {model_name}")
+			self._model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True, provider=provider)
+			self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+			self._model.save_pretrained(export_dir)
+			self._tokenizer.save_pretrained(export_dir)
+
+	def _encode(self, texts: List[str]) -> np.ndarray:
+		"""
+		Encode texts into normalized embeddings.
+
+		Args:
+			texts (List[str]): The texts to encode.
+
+		Returns:
+			np.ndarray: The embeddings of the texts, in the order of the texts.
+		"""
+		order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+		embeddings = [None] * len(texts)
+		for start in range(0, len(order), self.batch_size):
+			batch = order[start:start + self.batch_size]
+			inputs = self._tokenizer([texts[i] for i in batch], padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+			token_states = self._model(**inputs).last_hidden_state
+			mask = inputs["attention_mask"][..., None].astype(token_states.dtype)
+			pooled = (token_states * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+			pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+			for i, embedding in zip(batch, pooled):
+				embeddings[i] = embedding
+		return np.asarray(embeddings, dtype=np.float32)
+
+	def embed_documents(self, texts: List[str]) -> List[List[float]]:
+		"""
+		Embed documents.
+
+		Args:
+			texts (List[str]): The documents to embed.
+
+		Returns:
+			List[List[float]]: The embeddings of the documents.
+		"""
+		if not texts:
+			return []
+		return self._encode(texts).tolist()
+
+	def embed_query(self, text: str) -> List[float]:
+		"""
+		Embed a query.
+
+		Args:
+			text (str): The query to embed.
+
+		Returns:
+			List[float]: The embedding of the query.
+		"""
+		return self._encode([text])[0].tolist()
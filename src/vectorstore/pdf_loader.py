@@ -5,100 +5,332 @@ This module provides a custom PDF loader that can handle both local and internet
 PDF files. It includes functionality for downloading PDFs from URLs, reading
 PDF content, and converting it to markdown format for further processing.
 
-The module uses pymupdf4llm to extract PDF content as markdown, which preserves
-more of the document's structure and formatting than plain text extraction.
-This can improve the quality of the information retrieved from PDFs and make
-it more useful for downstream NLP tasks.
+The module extracts PDF content either as plain text with PyMuPDF, which is the
+fastest, or as markdown with pymupdf4llm, which preserves more of the document's
+structure and formatting. Markdown can improve the quality of the information
+retrieved from PDFs for structure-aware downstream tasks.
 """
 
+import math
+import multiprocessing
 import os
+import shutil
+import subprocess
 import tempfile
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Literal, Optional, Tuple, Union
 import requests
-import pymupdf4llm
+import pymupdf
 from langchain_core.documents import Document
+from src.cache.extraction_cache import hash_content
+from src.vectorstore.file_loader import FileLoader
 
-class PDFLoader:
+# Minimum number of pages of a PDF converted to markdown by each process of the shared pool
+PARALLEL_MIN_PAGES = 32
+# Minimum number of pages of a PDF whose plain text is extracted by each process of the shared
+# pool, much higher than for markdown as PyMuPDF extracts the text of a page in about a millisecond
+TEXT_PARALLEL_MIN_PAGES = 256
+# Maximum size of a downloaded PDF kept in memory instead of being written to a temporary file
+IN_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+# Maximum time pdftotext is given to extract a PDF, in seconds, before falling back to PyMuPDF
+PDFTOTEXT_TIMEOUT = 120
+# Version of the content extraction, to be increased when it changes the extracted content
+EXTRACTION_VERSION = 2
+# Flags of the PyMuPDF text extraction: only text characters, without image blocks, with the
+# words hyphenated across line breaks joined back, so that they are embedded as whole words
+TEXT_FLAGS = (pymupdf.TEXTFLAGS_TEXT | pymupdf.TEXT_DEHYPHENATE) & ~pymupdf.TEXT_PRESERVE_IMAGES
+
+
+def _to_markdown_pages(file_path: str, pages: List[int]) -> str:
+	"""Convert a range of pages of a PDF file to markdown, in a worker process."""
+	import pymupdf4llm
+	return pymupdf4llm.to_markdown(file_path, pages=pages)
+
+
+def _extract_text_pages(file_path: str, pages: List[int]) -> List[str]:
+	"""Extract the plain text of a range of pages of a PDF file, in a worker process."""
+	with pymupdf.open(file_path) as doc:
+		return [doc[page].get_text("text", flags=TEXT_FLAGS, sort=False) for page in pages]
+
+
+def _split_pages(page_count: int, max_workers: int, min_pages: int) -> Optional[List[List[int]]]:
+	"""Split the pages of a PDF into contiguous ranges for a pool of processes.
+
+	Each range holds at least min_pages pages. Returns None when the PDF is too small
+	for the pool to pay off.
+	"""
+	workers = min(max_workers, math.ceil(page_count / min_pages))
+	if workers < 2:
+		return None
+	pages_per_worker = math.ceil(page_count / workers)
+	return [list(range(start, min(start + pages_per_worker, page_count))) for start in range(0, page_count, pages_per_worker)]
+
+
+class InvalidPDFError(ValueError):
+	"""Raised when a downloaded file is not a PDF file."""
+
+
+class PDFLoader(FileLoader):
 	"""Custom PDF loader that can handle both local and internet PDF files.
 
 	This class provides functionality to download PDFs from URLs, extract content
-	from PDF files as markdown using pymupdf4llm, and convert the content into
-	Document objects for further processing. The markdown format preserves more
-	of the document's structure and formatting than plain text extraction.
+	from PDF files as plain text using PyMuPDF or as markdown using pymupdf4llm,
+	and convert the content into Document objects for further processing. The
+	markdown format preserves more of the document's structure and formatting
+	than plain text extraction, at a higher extraction cost.
 	"""
+	file_kind = "PDF"
+	cache_name = "pdf"
+	# Path of the poppler pdftotext binary, used for plain text extraction when installed
+	_pdftotext = shutil.which("pdftotext")
+	# Class-level pool of processes extracting the content of large PDFs, shared by every loader
+	_pool = None
+	_pool_workers = 0
+
+	def __init__(self, file_path: str, header_template: Optional[Dict[str, str]] = None, verify_ssl: bool = True, continue_on_failure: bool = False, session: Optional[requests.Session] = None, pdf_format: Literal["markdown", "text"] = "text"):
+		"""Initialize with file path or URL, optionally a session other than the shared one, and the format to extract the content as."""
+		super().__init__(file_path, header_template=header_template, verify_ssl=verify_ssl, continue_on_failure=continue_on_failure, session=session)
+		self.pdf_format = pdf_format
+
+	@classmethod
+	def start_pool(cls):
+		"""Start the pool of processes shared by the loaders to extract the content of large PDFs.
+
+		The pool must be started before the loading threads, as forking a process while
+		other threads hold locks (e.g. of the standard output or of MuPDF) can deadlock
+		the children, so all its workers are forked at once here. No pool is started with
+		a single CPU, or when processes cannot be forked; forked workers start without
+		re-importing the main module, which would reload the whole application.
+		"""
+		workers = os.cpu_count() or 1
+		if cls._pool is not None or workers < 2 or "fork" not in multiprocessing.get_all_start_methods():
+			return
+		pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+		# A first task forks every worker of a fork-based pool
+		pool.submit(int).result()
+		cls._pool, cls._pool_workers = pool, workers
+
+	@classmethod
+	def shutdown_pool(cls):
+		"""Shut down the pool of processes started by start_pool, once the loading is done."""
+		if cls._pool is not None:
+			cls._pool.shutdown()
+			cls._pool, cls._pool_workers = None, 0
+
+	def _check_pdf_signature(self, data: bytes, url: str, response: requests.Response):
+		"""Check that the start of a downloaded file holds the PDF signature.
+
+		Readers accept the signature anywhere in the first kilobyte, after leading garbage.
+
+		Raises:
+			InvalidPDFError: If the signature is not found.
+		"""
+		if b"%PDF-" not in data[:1024]:
+			content_type = response.headers.get("Content-Type", "unknown")
+			raise InvalidPDFError(f"{url} is not a PDF file (Content-Type: {content_type})")
+
+	def _download_pdf(self, url: str, headers: Dict[str, str]) -> Tuple[Optional[Union[str, bytes]], requests.Response]:
+		"""Download PDF from URL, in memory if it is small and to a temporary file otherwise.
+
+		PDFs announced with a size of at most IN_MEMORY_MAX_BYTES are returned as bytes and
+		parsed from memory, skipping the round-trip through the filesystem. Larger PDFs, or
+		PDFs of unknown size, are streamed to the file in chunks rather than buffered in
+		memory, so the peak memory does not grow with the size of the PDF.
+
+		The start of the response is checked for the PDF signature before anything is
+		written, so that e.g. an HTML error page is not downloaded in full.
+
+		Args:
+			url (str): The URL of the PDF.
+			headers (Dict[str, str]): The request headers, which may make the download conditional.
+
+		Returns:
+			Tuple[Optional[Union[str, bytes]], requests.Response]: The content of the PDF, the
+			path of the temporary file, or None if the PDF was not modified, and the response.
 
-	def __init__(self, file_path: str, header_template: Optional[Dict[str, str]] = None, verify_ssl: bool = True, continue_on_failure: bool = False):
-		"""Initialize with file path or URL."""
-		self.file_path = file_path
-		self.headers = header_template.copy() if header_template else {}
-		self.verify = verify_ssl
-		self.continue_on_failure = continue_on_failure
+		Raises:
+			InvalidPDFError: If the response is not a PDF file.
+		"""
+		with self.session.get(url, headers=headers, verify=self.verify, stream=True, timeout=30) as response:
+			response.raise_for_status()
+			if response.status_code == 304:
+				return None, response
 
-		# Add a user agent if not present
-		if "User-Agent" not in self.headers:
-			self.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+			content_length = response.headers.get("Content-Length", "")
+			if content_length.isdigit() and int(content_length) <= IN_MEMORY_MAX_BYTES:
+				content = response.content
+				self._check_pdf_signature(content, url, response)
+				return content, response
 
-	def _is_url(self, path: str) -> bool:
-		"""Check if the path is a URL."""
-		return path.startswith("http://") or path.startswith("https://")
+			chunks = response.iter_content(chunk_size=1 << 20)
+			first_chunk = next(chunks, b"")
+			self._check_pdf_signature(first_chunk, url, response)
 
-	def _download_pdf(self, url: str) -> str:
-		"""Download PDF from URL to a temporary file."""
-		response = requests.get(url, headers=self.headers, verify=self.verify)
-		response.raise_for_status()
+			# Create a temporary file to store the PDF
+			with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+				try:
+					temp_file.write(first_chunk)
+					for chunk in chunks:
+						temp_file.write(chunk)
+				except BaseException:
+					temp_file.close()
+					os.unlink(temp_file.name)
+					raise
 
-		# Create a temporary file to store the PDF
-		temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-		temp_file.write(response.content)
-		temp_file.close()
+		return temp_file.name, response
 
-		return temp_file.name
+	def _open_pdf(self, source: Union[str, bytes]) -> pymupdf.Document:
+		"""Open a PDF from its path or its content."""
+		if isinstance(source, bytes):
+			return pymupdf.open(stream=source, filetype="pdf")
+		return pymupdf.open(source)
 
-	def _extract_markdown_from_pdf(self, file_path: str) -> str:
-		"""Extract markdown content from a PDF file.
+	def _extract_markdown_from_pdf(self, source: Union[str, bytes]) -> str:
+		"""Extract markdown content from a PDF file or its content.
 
 		Uses pymupdf4llm to convert PDF content to markdown format, which preserves
 		more of the document's structure and formatting than plain text extraction.
+		Large PDF files are split into page ranges converted by the pool of processes
+		of start_pool when it was started, as the conversion is CPU-bound and mostly
+		runs in Python.
 		"""
-		markdown_content = pymupdf4llm.to_markdown(file_path)
-		return markdown_content
+		# Imported on first use, as its layout analysis modules are slow to import and plain text runs never need them
+		import pymupdf4llm
 
-	def load(self) -> List[Document]:
-		"""Load PDF data into document objects with markdown content.
+		with self._open_pdf(source) as doc:
+			page_count = doc.page_count
+			if isinstance(source, bytes):
+				# Only files can be opened again by the worker processes
+				return pymupdf4llm.to_markdown(doc)
 
-		This method handles both local and remote PDF files, extracts their content
-		as markdown using pymupdf4llm, and returns a list of Document objects with
-		the markdown content and appropriate metadata.
+		pool = PDFLoader._pool
+		page_ranges = _split_pages(page_count, PDFLoader._pool_workers, PARALLEL_MIN_PAGES) if pool is not None else None
+		if page_ranges is None:
+			return pymupdf4llm.to_markdown(source)
+
+		markdown_parts = pool.map(_to_markdown_pages, [source] * len(page_ranges), page_ranges)
+		return "".join(markdown_parts)
+
+	def _extract_text_from_pdf(self, source: Union[str, bytes]) -> Tuple[str, str]:
+		"""Extract plain text content from a PDF file or its content.
+
+		Uses the native pdftotext binary of poppler when it is installed, and the text
+		extraction of PyMuPDF page by page otherwise or if pdftotext fails. Both skip
+		the layout analysis needed to emit markdown headings and tables. Pages without
+		text (e.g. scanned images or blank pages) are left out. With PyMuPDF, the pages of
+		very large PDF files are extracted by the pool of processes of start_pool when it
+		was started, smaller ones in the calling thread as a page takes about a millisecond.
+
+		Returns:
+			Tuple[str, str]: The extracted text, and the engine that extracted it.
+		"""
+		if self._pdftotext is not None:
+			try:
+				# pdftotext reads the PDF from its standard input when given "-" as the input file
+				input_file, input_data = ("-", source) if isinstance(source, bytes) else (source, None)
+				result = subprocess.run([self._pdftotext, "-enc", "UTF-8", input_file, "-"], input=input_data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, timeout=PDFTOTEXT_TIMEOUT)
+				# pdftotext ends every page with a form feed
+				page_texts = result.stdout.decode("utf-8", "replace").split("\f")
+				return "\n\n".join(text for text in page_texts if text.strip()), "pdftotext"
+			except (OSError, subprocess.SubprocessError) as e:
+				print(f"pdftotext failed on {self.file_path}, falling back to PyMuPDF: {e}")
+
+		pool = PDFLoader._pool
+		with self._open_pdf(source) as doc:
+			# Only files can be opened again by the worker processes
+			page_ranges = None
+			if pool is not None and not isinstance(source, bytes):
+				page_ranges = _split_pages(doc.page_count, PDFLoader._pool_workers, TEXT_PARALLEL_MIN_PAGES)
+			if page_ranges is None:
+				page_texts = [page.get_text("text", flags=TEXT_FLAGS, sort=False) for page in doc]
+
+		if page_ranges is not None:
+			range_texts = pool.map(_extract_text_pages, [source] * len(page_ranges), page_ranges)
+			page_texts = [text for texts in range_texts for text in texts]
+		return "\n\n".join(text for text in page_texts if text.strip()), "pymupdf"
+
+	def _get_variant(self, engine: str) -> str:
+		"""Get the variant of the content extracted by an engine in the extraction cache."""
+		# pdftotext and PyMuPDF extract slightly different text
+		return f"{self.pdf_format}-{engine}-v{EXTRACTION_VERSION}"
+
+	def _get_variants(self) -> List[str]:
+		"""Get the variants the content may be cached as, the one of the preferred engine first.
+
+		The content of a PDF pdftotext failed on is cached as extracted by PyMuPDF.
+		"""
+		if self.pdf_format == "text" and self._pdftotext is not None:
+			return [self._get_variant("pdftotext"), self._get_variant("pymupdf")]
+		return [self._get_variant("pymupdf")]
+
+	def _extract_content(self, source: Union[str, bytes], digest: Optional[str] = None) -> str:
+		"""Extract the content of a PDF file or of its content in the configured format.
+
+		The extracted content is cached on disk by the digest of the PDF, so that a PDF
+		already extracted, even from another path or URL, is not parsed again.
 		"""
-		docs = []
+		cache = self._get_extraction_cache()
+		digest = digest or hash_content(source)
+		for variant in self._get_variants():
+			content = cache.get(digest, variant)
+			if content is not None:
+				return content
+
+		if self.pdf_format == "markdown":
+			content, engine = self._extract_markdown_from_pdf(source), "pymupdf"
+		else:
+			content, engine = self._extract_text_from_pdf(source)
+		cache.put(digest, self._get_variant(engine), content)
+		return content
+
+	def _extract_url_content(self, url: str) -> str:
+		"""Download a PDF and extract its content, unless it was not modified since its last download.
+
+		The downloads of a URL already loaded are conditional, and a 304 Not Modified
+		response is served from the extraction cache without downloading the PDF again.
+		"""
+		headers, cached_content = self._revalidation(url, *self._get_variants())
+		pdf, response = self._download_pdf(url, headers)
+		if pdf is None:
+			if cached_content is not None:
+				return cached_content
+			# Nothing to serve the response from, download the PDF again without the validators
+			self._forget_validators(url)
+			pdf, response = self._download_pdf(url, self.headers)
+			self._check_modified(url, response)
+
 		try:
-			# Handle URL or local file
-			if self._is_url(self.file_path):
-				# Download PDF from URL
-				temp_file_path = self._download_pdf(self.file_path)
-				content = self._extract_markdown_from_pdf(temp_file_path)
-
-				# Clean up temporary file
-				os.unlink(temp_file_path)
-
-				source = self.file_path
-			else:
-				# Local file
-				content = self._extract_markdown_from_pdf(self.file_path)
-				source = os.path.abspath(self.file_path)
-
-			metadata = {
-				"source": source,
-				"title": os.path.basename(self.file_path),
-				"file_type": "pdf",
-				"content_format": "markdown"
-			}
-
-			docs.append(Document(page_content=content, metadata=metadata))
-		except Exception as e:
-			if self.continue_on_failure:
-				print(f"Error processing PDF {self.file_path}: {e}")
-			else:
-				raise e
-
-		return docs
+			digest = hash_content(pdf)
+			content = self._extract_content(pdf, digest)
+		finally:
+			# Clean up temporary file, even if the extraction failed
+			if isinstance(pdf, str):
+				os.unlink(pdf)
+		self._remember_validators(url, digest, response)
+		return content
+
+	def _lazy_load_documents(self) -> Iterator[Document]:
+		"""Load PDF data into document objects with plain text or markdown content.
+
+		This method handles both local and remote PDF files, extracts their content
+		in the configured format, and yields a Document object with the content and
+		appropriate metadata.
+		"""
+		# Handle URL or local file
+		if self._is_url(self.file_path):
+			# Download PDF from URL
+			content = self._extract_url_content(self.file_path)
+			source = self.file_path
+		else:
+			# Local file
+			content = self._extract_content(self.file_path)
+			source = os.path.abspath(self.file_path)
+
+		metadata = {
+			"source": source,
+			"title": os.path.basename(self.file_path),
+			"file_type": "pdf",
+			"content_format": self.pdf_format
+		}
+
+		yield Document(page_content=content, metadata=metadata)
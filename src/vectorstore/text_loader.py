@@ -10,12 +10,17 @@ important for structured text formats like Markdown.
 """
 
 import os
-import tempfile
-from typing import List, Dict, Optional
-import requests
+from typing import Iterator
 from langchain_core.documents import Document
+from src.cache.extraction_cache import hash_content
+from src.vectorstore.file_loader import FileLoader
 
-class TextLoader:
+# Number of bytes of the segments local text files are read in
+SEGMENT_SIZE = 1 << 20
+# Variant of the downloaded text in the extraction cache, to be increased when its decoding changes
+DOWNLOAD_VARIANT = "utf-8-v1"
+
+class TextLoader(FileLoader):
 	"""Custom text file loader that can handle various text-based file formats.
 
 	This class provides functionality to download text files from URLs, read content
@@ -23,34 +28,34 @@ class TextLoader:
 	processing. It supports various text formats including Markdown (.md), plain text (.txt),
 	and other text-based formats.
 	"""
+	file_kind = "text file"
+	cache_name = "text"
 
-	def __init__(self, file_path: str, header_template: Optional[Dict[str, str]] = None, verify_ssl: bool = True, continue_on_failure: bool = False):
-		"""Initialize with file path or URL."""
-		self.file_path = file_path
-		self.headers = header_template.copy() if header_template else {}
-		self.verify = verify_ssl
-		self.continue_on_failure = continue_on_failure
-
-		# Add a user agent if not present
-		if "User-Agent" not in self.headers:
-			self.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-
-	def _is_url(self, path: str) -> bool:
-		"""Check if the path is a URL."""
-		return path.startswith("http://") or path.startswith("https://")
+	def _fetch_text(self, url: str) -> str:
+		"""Fetch text content from URL.
 
-	def _download_text(self, url: str) -> str:
-		"""Download text content from URL to a temporary file."""
-		response = requests.get(url, headers=self.headers, verify=self.verify)
+		The content is decoded in memory, like a local file, rather than being written
+		to a temporary file and read back. The decoded text is cached, and the next
+		downloads of the URL are conditional, so that unchanged text is not downloaded again.
+		"""
+		headers, cached_content = self._revalidation(url, DOWNLOAD_VARIANT)
+		response = self.session.get(url, headers=headers, verify=self.verify, timeout=30)
 		response.raise_for_status()
-
-		# Create a temporary file to store the text content
-		file_extension = self._get_file_extension(url)
-		temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-		temp_file.write(response.content)
-		temp_file.close()
-
-		return temp_file.name
+		if response.status_code == 304:
+			if cached_content is not None:
+				return cached_content
+			# Nothing to serve the response from, download the text again without the validators
+			self._forget_validators(url)
+			response = self.session.get(url, headers=self.headers, verify=self.verify, timeout=30)
+			response.raise_for_status()
+			self._check_modified(url, response)
+
+		# Decode as UTF-8 like local files, response.text would fall back to ISO-8859-1 for text/* without a charset
+		content = self._decode(response.content)
+		digest = hash_content(response.content)
+		self._get_extraction_cache().put(digest, DOWNLOAD_VARIANT, content)
+		self._remember_validators(url, digest, response)
+		return content
 
 	def _get_file_extension(self, path: str) -> str:
 		"""Get the file extension from the path."""
@@ -61,10 +66,38 @@ class TextLoader:
 			return ".txt"
 		return ext
 
-	def _read_text_file(self, file_path: str) -> str:
-		"""Read content from a text file."""
-		with open(file_path, 'r', encoding='utf-8') as file:
-			return file.read()
+	def _iter_text_file(self, file_path: str) -> Iterator[str]:
+		"""Read content from a text file in segments.
+
+		The segments hold about SEGMENT_SIZE bytes and end at line breaks, unless a line
+		is longer than that, so a large file is never held in memory at once. The file is
+		read in binary mode and every segment is decoded at once, instead of going through
+		the incremental decoder and newline translation of text mode. A line break byte is
+		never part of a multi-byte UTF-8 character, so segments ending at one decode whole.
+		An empty file gives a single empty segment, like a file read at once.
+		"""
+		with open(file_path, 'rb', buffering=0) as file:
+			pending = b""
+			empty = True
+			for chunk in iter(lambda: file.read(SEGMENT_SIZE), b""):
+				pending = pending + chunk
+				cut = pending.rfind(b"\n") + 1
+				if not cut and len(pending) >= SEGMENT_SIZE:
+					# Cut before the last character, which may not be complete yet
+					cut = len(pending) - 1
+					while cut and pending[cut] & 0xC0 == 0x80:
+						cut -= 1
+					cut = cut or len(pending)
+				if cut:
+					yield self._decode(pending[:cut])
+					pending = pending[cut:]
+					empty = False
+			if pending or empty:
+				yield self._decode(pending)
+
+	def _decode(self, data: bytes) -> str:
+		"""Decode UTF-8 text, replacing invalid bytes and translating Windows line breaks."""
+		return data.decode("utf-8", errors="replace").replace("\r\n", "\n")
 
 	def _get_content_format(self, file_path: str) -> str:
 		"""Determine the content format based on file extension."""
@@ -77,32 +110,29 @@ class TextLoader:
 			# Default to text for other extensions
 			return "text"
 
-	def load(self) -> List[Document]:
-		"""Load text data into document objects.
+	def _lazy_load_documents(self) -> Iterator[Document]:
+		"""Lazily load text data into document objects.
 
 		This method handles both local and remote text files, reads their content,
-		and returns a list of Document objects with the content and appropriate metadata.
+		and yields Document objects with the content and appropriate metadata. Local
+		files are yielded as one document per segment of about SEGMENT_SIZE bytes,
+		so that large files can be split into chunks without being fully loaded.
 		"""
-		docs = []
-		try:
-			# Handle URL or local file
-			if self._is_url(self.file_path):
-				# Download text from URL
-				temp_file_path = self._download_text(self.file_path)
-				content = self._read_text_file(temp_file_path)
-
-				# Clean up temporary file
-				os.unlink(temp_file_path)
-
-				source = self.file_path
-			else:
-				# Local file
-				content = self._read_text_file(self.file_path)
-				source = os.path.abspath(self.file_path)
-
-			content_format = self._get_content_format(self.file_path)
-			file_type = self._get_file_extension(self.file_path)[1:]  # Remove the dot
+		# Handle URL or local file
+		if self._is_url(self.file_path):
+			# Fetch text from URL
+			segments = [self._fetch_text(self.file_path)]
+
+			source = self.file_path
+		else:
+			# Local file
+			segments = self._iter_text_file(self.file_path)
+			source = os.path.abspath(self.file_path)
+
+		content_format = self._get_content_format(self.file_path)
+		file_type = self._get_file_extension(self.file_path)[1:]  # Remove the dot
 
+		for content in segments:
 			metadata = {
 				"source": source,
 				"title": os.path.basename(self.file_path),
@@ -110,11 +140,4 @@ class TextLoader:
 				"content_format": content_format
 			}
 
-			docs.append(Document(page_content=content, metadata=metadata))
-		except Exception as e:
-			if self.continue_on_failure:
-				print(f"Error processing text file {self.file_path}: {e}")
-			else:
-				raise e
-
-		return docs
\ No newline at end of file
+			yield Document(page_content=content, metadata=metadata)